@@ -0,0 +1,62 @@
+"""Retained memory per problem: raw JSON dicts against the slotted Catalog.
+
+The dict layout is what the cog kept before: the decoded problem objects plus
+the problems_by_points buckets. The catalog layout is a Catalog of
+CodeforcesProblem records with its points and tag indexes, measured with and
+without the title index $search builds. Memory is counted with tracemalloc
+after the decoded document has been dropped.
+
+    python -m benchmarks.catalog_memory [--problems N]
+"""
+import argparse
+import gc
+import json
+import tracemalloc
+from benchmarks.fixtures import cf_problemset_body
+from utils.catalog import Catalog, CodeforcesProblem
+
+
+def dict_layout(body):
+    problems = json.loads(body)['result']['problems']
+    by_points = {}
+    for details in problems:
+        if 'rating' in details:
+            by_points.setdefault(details['rating'], []).append(details)
+    return problems, by_points
+
+def catalog_layout(body):
+    return Catalog(map(CodeforcesProblem.from_json, json.loads(body)['result']['problems']))
+
+def indexed_catalog_layout(body):
+    catalog = catalog_layout(body)
+    catalog.title_index
+    return catalog
+
+layouts = (('dicts', dict_layout), ('catalog', catalog_layout), ('catalog + titles', indexed_catalog_layout))
+
+def retained(build, body):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build(body)
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del kept
+    return size
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--problems', type=int, default=10000)
+    args = parser.parse_args()
+
+    body = cf_problemset_body(args.problems)
+    baseline = None
+    print('%-18s %10s %12s %8s' % ('layout', 'total MB', 'per problem', 'ratio'))
+    for name, build in layouts:
+        size = retained(build, body)
+        baseline = baseline or size
+        print('%-18s %10.2f %10d B %7.2fx' % (name, size / 2**20, size // args.problems, size / baseline))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Checks and times the DMOJ submission widget parsers.
+
+Every saved widget under benchmarks/widgets is parsed by both the lxml XPath
+parsers in utils.htmlparse and the BeautifulSoup versions they replaced. The
+script exits non-zero if any output differs, then prints the time per parse.
+raw_result is compared by its text: BeautifulSoup drops the whitespace between
+table rows and reorders attributes when it serializes markup, and nothing
+displays raw_result.
+
+    python -m benchmarks.dmoj_widgets [--number N]
+"""
+import argparse
+import os
+import sys
+import timeit
+import bs4 as bs
+import lxml.html
+from utils import htmlparse
+
+widgets_directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'widgets')
+
+
+def bs4_parse_dmoj_submission(html):
+    soup = bs.BeautifulSoup(html, 'lxml')
+    return {
+        'status': str(soup.find_all('span', attrs={'class' : 'status'})[0].contents[0]),
+        'time': str(soup.find_all('div',  attrs={'class' : 'time'})[-1].contents[0]).strip(),
+        'memory': str(soup.find_all('div',  attrs={'class' : 'memory'})[0].contents[0]),
+        'problem': str(soup.find_all('div',  attrs={'class' : 'name'})[0].find('a').contents[0])
+    }
+
+def bs4_parse_dmoj_testcases(html):
+    soup = bs.BeautifulSoup(html, 'lxml')
+    result = {
+        'raw_result': str(soup.find('body').contents[0]),
+        'cases': []
+    }
+    tables = soup.find_all('table', attrs={'class': 'submissions-status-table'})
+    if len(tables) == 0:
+        return result
+    for row in tables[0].find_all('tr'):
+        try:
+            id = int(row.get('id'))
+        except (TypeError, ValueError):
+            continue
+        children = row.find_all('td')
+        result['cases'].append({
+            'id': id,
+            'descriptor': str(children[0].find('b').contents[0]),
+            'status': str(children[1].find('span').contents[0]),
+            'details': {
+                'time': str(children[2].find('span').contents[0]).replace(',', ''),
+                'memory': str(children[3].contents[0]).replace('\xa0', ' ').replace(']', ''),
+                'points': str(children[4].contents[0])
+            }
+        })
+    return result
+
+# widget file prefix: (old parser, new parser)
+parsers = {
+    'single_submission': (bs4_parse_dmoj_submission, htmlparse.parse_dmoj_submission),
+    'submission_testcases': (bs4_parse_dmoj_testcases, htmlparse.parse_dmoj_testcases)
+}
+
+def comparable(result):
+    if 'raw_result' not in result:
+        return result
+    text = lxml.html.fragment_fromstring(result['raw_result'], create_parent='div').text_content()
+    return dict(result, raw_result=' '.join(text.split()))
+
+def widgets():
+    for name in sorted(os.listdir(widgets_directory)):
+        for prefix, (old, new) in parsers.items():
+            if name.startswith(prefix) and name.endswith('.html'):
+                with open(os.path.join(widgets_directory, name), 'r', encoding='utf-8') as f:
+                    yield name, f.read(), old, new
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--number', type=int, default=2000)
+    args = parser.parse_args()
+
+    mismatches = 0
+    for name, html, old, new in widgets():
+        expected, actual = old(html), new(html)
+        if comparable(expected) != comparable(actual):
+            mismatches += 1
+            print('MISMATCH %s\n  bs4:  %r\n  lxml: %r' % (name, expected, actual))
+    if mismatches > 0:
+        sys.exit(1)
+
+    print('%-36s %10s %10s %8s' % ('widget', 'bs4 us', 'lxml us', 'speedup'))
+    for name, html, old, new in widgets():
+        old_time = min(timeit.repeat(lambda: old(html), number=args.number, repeat=3)) / args.number
+        new_time = min(timeit.repeat(lambda: new(html), number=args.number, repeat=3)) / args.number
+        print('%-36s %10.1f %10.1f %7.1fx' % (name, old_time*1e6, new_time*1e6, old_time/new_time))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+import json
+import random as rand
+
+cf_tags = ('implementation', 'math', 'greedy', 'dp', 'data structures', 'brute force', 'constructive algorithms',
+           'graphs', 'sortings', 'binary search', 'dfs and similar', 'trees', 'strings', 'number theory', 'combinatorics')
+# words of problem titles, most common first
+title_words = ('the of and a on in to with for game tree sum array string path query queries minimum maximum number '
+               'graph subarray pairs xor binary two problem counting segments permutation points sequence matrix grid '
+               'easy hard version strings trees numbers paths cycle subsequence shortest longest distinct good beautiful '
+               'make equal sort sorting palindrome prefix suffix range ranges update operations operation coins cards '
+               'robot robots city cities roads road magic special new another simple triangle square squares circle '
+               'bits bit divisors prime primes gcd lcm mod modulo count find k-th kth sums sets set chess board '
+               'alice bob john vasya petya little big small building buildings travel journey lucky island islands '
+               'candies candy boxes box balls ball team teams contest party friends friend').split()
+
+
+def cf_problemset(count, seed=0):
+    # shaped like https://codeforces.com/api/problemset.problems
+    rng = rand.Random(seed)
+    problems = []
+    statistics = []
+    for id in range(count):
+        contest, index = 1 + id//6, 'ABCDEF'[id % 6]
+        problem = {
+            'contestId': contest,
+            'index': index,
+            'name': 'Problem %d %s' % (id, ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for letter in range(8))),
+            'type': 'PROGRAMMING',
+            'points': 500.0 * (id % 6 + 1),
+            'tags': rng.sample(cf_tags, rng.randint(0, 4))
+        }
+        if rng.random() < 0.85:
+            problem['rating'] = rng.randrange(800, 3600, 100)
+        problems.append(problem)
+        statistics.append({'contestId': contest, 'index': index, 'solvedCount': rng.randint(0, 50000)})
+    return {'status': 'OK', 'result': {'problems': problems, 'problemStatistics': statistics}}
+
+def cf_problemset_body(count, seed=0):
+    return json.dumps(cf_problemset(count, seed)).encode('utf-8')
+
+def problem_titles(count, seed=0):
+    # a few common words per title, with the odd made-up name and version suffix, so trigram postings are as skewed as real ones
+    rng = rand.Random(seed)
+    weights = [1 / (rank+1)**0.8 for rank in range(len(title_words))]
+    titles = []
+    for id in range(count):
+        words = rng.choices(title_words, weights, k=rng.randint(1, 5))
+        if rng.random() < 0.3:
+            words.insert(rng.randrange(len(words)+1), ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for letter in range(rng.randint(4, 9))))
+        title = ' '.join(words).title()
+        if rng.random() < 0.05:
+            title += rng.choice((' (Easy Version)', ' (Hard Version)', ' II', ' 2'))
+        titles.append(title)
+    return titles
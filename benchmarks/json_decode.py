@@ -0,0 +1,88 @@
+"""Peak RSS and wall time of loading the Codeforces problemset.
+
+Compares the old path (json.loads of the whole document, then bucketing the
+raw dicts by rating) with the streaming path the refresh uses now: stream
+only decodes and projects the records, catalog also builds the Catalog indexes.
+Each mode runs in a fresh interpreter so peak RSS is not shared between them.
+
+    python -m benchmarks.json_decode [--problems N] [--body path/to/problemset.json]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+from time import perf_counter
+from benchmarks.fixtures import cf_problemset_body
+from utils.catalog import Catalog, CodeforcesProblem
+from utils.jsonstream import iter_items
+
+
+def decode_json(body):
+    problems = json.loads(body.decode('utf-8'))['result']['problems']
+    by_points = {}
+    for details in problems:
+        if 'rating' in details:
+            by_points.setdefault(details['rating'], []).append(details)
+    return problems, by_points
+
+def decode_stream(body):
+    return [CodeforcesProblem.from_json(problem) for problem in iter_items(body, 'result.problems')]
+
+def decode_catalog(body):
+    return Catalog(map(CodeforcesProblem.from_json, iter_items(body, 'result.problems')))
+
+modes = {'json': decode_json, 'stream': decode_stream, 'catalog': decode_catalog}
+
+def run_mode(mode, path):
+    with open(path, 'rb') as f:
+        body = f.read()
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = perf_counter()
+    result = modes[mode](body)
+    elapsed = perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({'mode': mode, 'seconds': elapsed, 'peak_kb': peak - before}))
+    return result
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--problems', type=int, default=10000)
+    parser.add_argument('--body')
+    parser.add_argument('--mode', choices=sorted(modes))
+    parser.add_argument('--write')
+    args = parser.parse_args()
+
+    if args.mode is not None:
+        run_mode(args.mode, args.body)
+        return
+    if args.write is not None:
+        with open(args.write, 'wb') as f:
+            f.write(cf_problemset_body(args.problems))
+        return
+
+    try:
+        import ijson
+        backend = 'ijson ' + ijson.backend
+    except ImportError:
+        backend = 'json fallback (ijson not installed)'
+    path = args.body
+    if path is None:
+        # built in a child too: Linux carries the peak RSS of this process across exec into the runs below
+        fd, path = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        subprocess.check_call([sys.executable, '-m', 'benchmarks.json_decode', '--problems', str(args.problems), '--write', path])
+    try:
+        print('body: %.1f MB, stream backend: %s' % (os.path.getsize(path) / 2**20, backend))
+        for mode in ('json', 'stream', 'catalog'):
+            output = subprocess.check_output([sys.executable, '-m', 'benchmarks.json_decode', '--mode', mode, '--body', path])
+            result = json.loads(output)
+            print('%-7s  %8.1f ms  peak +%.1f MB' % (mode, result['seconds']*1000, result['peak_kb'] / 1024))
+    finally:
+        if args.body is None:
+            os.remove(path)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""Time of drawing an unsolved problem from a large catalog.
+
+Builds a synthetic Codeforces catalog and a solved set covering half of it,
+then times the steps $random takes: turning the solved set into a bitset
+(once per catalog version) and Catalog.sample_many over a rating range, the
+whole catalog, and a range where a single unsolved problem is left.
+
+    python -m benchmarks.random_sampling [--problems N] [--solved N] [--number N]
+"""
+import argparse
+import random as rand
+import timeit
+from benchmarks.fixtures import cf_problemset
+from utils.catalog import Catalog, CodeforcesProblem
+from utils.solvedstore import SolvedSet
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--problems', type=int, default=100000)
+    parser.add_argument('--solved', type=int, default=50000)
+    parser.add_argument('--number', type=int, default=10000)
+    args = parser.parse_args()
+
+    catalog = Catalog(map(CodeforcesProblem.from_json, cf_problemset(args.problems)['result']['problems']))
+    rng = rand.Random(1)
+    solved = SolvedSet(problem.key for problem in rng.sample(catalog.problems, args.solved))
+
+    # the first call also builds the key -> position index of the catalog
+    first_build = timeit.timeit(lambda: catalog.mask(solved.problems), number=1)
+    build = min(timeit.repeat(lambda: catalog.mask(solved.problems), number=1, repeat=5))
+    excluded = solved.mask(catalog)
+
+    # a rated range where every problem but one is solved
+    start, end = catalog.span(3500, 3500)
+    nearly_solved = excluded | ((1 << end) - (1 << start))
+    nearly_solved &= ~(1 << start)
+
+    cases = (
+        ('$random cf 1400 1900', lambda: catalog.sample_many(*catalog.span(1400, 1900), 1, excluded)),
+        ('whole catalog', lambda: catalog.sample_many(0, len(catalog), 1, excluded)),
+        ('one unsolved in range', lambda: catalog.sample_many(start, end, 1, nearly_solved)),
+        ('x5 spread, 1400 1900', lambda: catalog.sample_many(*catalog.span(1400, 1900), 5, excluded, spread=True))
+    )
+    print('%d problems, %d solved' % (len(catalog), len(solved)))
+    print('%-24s %10.1f ms (first set per catalog version)' % ('building solved bitset', first_build*1000))
+    print('%-24s %10.1f ms (once per set and catalog version)' % ('building solved bitset', build*1000))
+    for name, draw in cases:
+        per_call = min(timeit.repeat(draw, number=args.number, repeat=3)) / args.number
+        print('%-24s %10.1f us per call' % (name, per_call*1e6))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Time of a $search lookup in the title trigram index.
+
+Builds a TrigramIndex over synthetic titles made of common problem-title
+words, then times TrigramIndex.search for fixed queries and for queries cut
+from random titles, some with a letter dropped. Every result is checked
+against a brute-force Jaccard ranking over all titles; the script exits
+non-zero if any top-k list of scores differs.
+
+    python -m benchmarks.title_search [--titles N] [--queries N] [--number N]
+"""
+import argparse
+import heapq
+import random as rand
+import sys
+import timeit
+from benchmarks.fixtures import problem_titles
+from utils.trigramindex import TrigramIndex, trigrams
+
+fixed_queries = ('sum', 'the game of trees', 'string path query', 'sum of two arrays', 'magic squares', 'shortst path',
+                 'xorrangeupdate', 'vasya and candies', 'minimum number of operations to make array equal')
+
+
+def sampled_queries(titles, count, seed=1):
+    rng = rand.Random(seed)
+    queries = []
+    for index in range(count):
+        words = rng.choice(titles).split()
+        query = ' '.join(rng.sample(words, rng.randint(1, len(words))))
+        if rng.random() < 0.5 and len(query) > 3:
+            typo = rng.randrange(len(query))
+            query = query[:typo] + query[typo+1:]
+        queries.append(query)
+    return queries
+
+def brute_force(title_grams, query, limit=5):
+    grams = trigrams(query)
+    return heapq.nlargest(limit, (len(grams & other) / len(grams | other) for other in title_grams))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--titles', type=int, default=50000)
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('--number', type=int, default=20)
+    args = parser.parse_args()
+
+    titles = problem_titles(args.titles)
+    build = timeit.timeit(lambda: TrigramIndex(titles), number=1)
+    index = TrigramIndex(titles)
+    queries = fixed_queries + tuple(sampled_queries(titles, args.queries))
+
+    title_grams = [trigrams(title) for title in titles]
+    mismatches = 0
+    for query in queries:
+        expected = [round(score, 9) for score in brute_force(title_grams, query)]
+        actual = [round(score, 9) for score, id in index.search(query)]
+        if expected != actual:
+            mismatches += 1
+            print('MISMATCH %r\n  brute force: %r\n  index:       %r' % (query, expected, actual))
+    if mismatches > 0:
+        sys.exit(1)
+
+    times = {query: min(timeit.repeat(lambda: index.search(query), number=args.number, repeat=3)) / args.number for query in queries}
+    ordered = sorted(times.values())
+    print('%d titles, index built in %.2fs' % (len(titles), build))
+    for query in fixed_queries:
+        print('%-52s %8.3f ms' % (query, times[query]*1000))
+    print('%d queries: median %.3f ms, p95 %.3f ms, max %.3f ms' % (len(ordered), ordered[len(ordered)//2]*1000, ordered[int(len(ordered)*0.95)]*1000, ordered[-1]*1000))
+
+if __name__ == '__main__':
+    main()
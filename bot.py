@@ -11,6 +11,7 @@ import cogs.problems_rankings as problems_rankings
 import cogs.contests as contests
 import cogs.searcher as searcher
 from connector import mySQLConnection as query
+from migrate import migrate, explain
 from utils.country import Country
 from utils.onlinejudges import OnlineJudges, NoSuchOJException
 
@@ -33,17 +34,18 @@ finally:
             dbl_tokens[dbl] = dbl_token
     bot_id = config['bot']['id']
     owner_id = config['bot']['owner_id']
+    explain_on_startup = config['mysql'].get('explain_on_startup', False)
 
 replies = ('Practice Bot believes that with enough practice, you can complete any goal!', 'Keep practicing! Practice Bot says that every great programmer starts somewhere!', 'Hey now, you\'re an All Star, get your game on, go play (and practice)!',
            'Stuck on a problem? Every logical problem has a solution. You just have to keep practicing!', ':heart:')
 
-custom_prefixes = query.get_prefixes()
+custom_prefixes = {}
 
 
 async def determine_prefix(bot, message):
     guild = message.guild
     if guild:
-        query.insert_ignore_server(guild.id)
+        await query.insert_ignore_server(guild.id)
         return custom_prefixes.get(guild.id, prefix)
     return prefix
 
@@ -70,8 +72,8 @@ async def changenick(ctx, member: discord.Member, fix):
 
 async def prefix_from_guild(guild):
     if guild:
-        query.insert_ignore_server(guild.id)
-        custom = query.get_prefix(guild.id)
+        await query.insert_ignore_server(guild.id)
+        custom = await query.get_prefix(guild.id)
         return prefix if custom is None else custom
     return prefix
 
@@ -100,8 +102,8 @@ async def setprefix(ctx, fix: str=None):
             fix = prefix
         previous_prefix = custom_prefixes.get(ctx.message.guild.id, prefix)
         custom_prefixes[ctx.message.guild.id] = fix
-        query.insert_ignore_server(ctx.message.guild.id)
-        query.update_server_prefix(ctx.message.guild.id, fix)
+        await query.insert_ignore_server(ctx.message.guild.id)
+        await query.update_server_prefix(ctx.message.guild.id, fix)
         if default:
             await ctx.send(ctx.message.author.display_name + ', No prefix given, defaulting to `%s`. Server prefix changed from `%s` to `%s`' % (prefix, previous_prefix, fix))
         else:
@@ -173,8 +175,8 @@ async def on_command_error(ctx, error):
 @bot.command(aliases=['toggleJoin', 'tj'])
 @commands.has_permissions(administrator=True)
 async def togglejoin(ctx):
-    join_message = query.get_join_message(ctx.message.guild.id)
-    query.update_server(ctx.message.guild.id, 'join_message', not join_message)
+    join_message = await query.get_join_message(ctx.message.guild.id)
+    await query.update_server(ctx.message.guild.id, 'join_message', not join_message)
     await ctx.send(ctx.message.author.display_name + ', on-join direct messages for the bot turned `%s`.' % ('ON' if not join_message else 'OFF'))
 
 
@@ -186,24 +188,24 @@ async def stats(ctx, option=None):
         return
     embed = discord.Embed(title='Bot Analytics')
     embed.add_field(name='Server count', value=len(bot.guilds), inline=False)
-    embed.add_field(name='User count', value=query.user_count(), inline=False)
-    embed.add_field(name='DMOJ', value=query.get_global_linked_count('dmoj'), inline=False)
-    embed.add_field(name='Codeforces', value=query.get_global_linked_count('codeforces'), inline=False)
-    def country_with_count(listitem):
-        return str(Country(listitem.split(' - ')[0])) + ' - ' + listitem.split(' - ')[1]
-    embed.add_field(name='Countries', value='\n'.join(map(country_with_count, sorted(query.get_global_countries(), key=lambda listitem: int(listitem.split(' - ')[1]), reverse=True))), inline=False)
+    stats = await query.get_stats()
+    embed.add_field(name='User count', value=stats['users'], inline=False)
+    embed.add_field(name='DMOJ', value=stats['dmoj'], inline=False)
+    embed.add_field(name='Codeforces', value=stats['codeforces'], inline=False)
+    countries = sorted(stats['countries'].items(), key=lambda item: item[1], reverse=True)
+    embed.add_field(name='Countries', value='\n'.join(str(Country(country)) + ' - ' + str(count) for country, count in countries), inline=False)
     await ctx.send(embed=embed)
 
 
 @bot.event
 async def on_member_join(member):
     global prefix
-    join_message = query.get_join_message(member.guild.id)
+    join_message = await query.get_join_message(member.guild.id)
     if not join_message:
         return
-    this_user = query.get_user(member.id)
+    this_user = await query.get_user(member.id)
     if this_user == {}:
-        query.insert_ignore_user(member.id)
+        await query.insert_ignore_user(member.id)
         server_prefix = await prefix_from_guild(member.guild)
         await member.send('Hello, %s, and welcome to %s! The default prefix for this server is `%s`, but in direct messaging, use the prefix `%s`. It would seem that you have yet to join a server that has Practice Bot! Using Practice Bot, you can link your DMOJ or Codeforces account to your Discord account to perform different commands. You may use one of the following formats:\n\n*Please use connect commands in this direct message chat only!*\n\n`%sconnect dmoj <dmoj-api-token>` (your DMOJ API token can be found by going to https://dmoj.ca/edit/profile/ and selecting the __Generate__ or __Regenerate__ option next to API Token)\n\n`%sconnect cf <codeforces-handle>`\n\nUse `%shelp` to see a full list of commands and more details.' % (member.display_name, member.guild.name, server_prefix, prefix, prefix, prefix, prefix))
 
@@ -233,6 +235,13 @@ async def on_ready():
 
 
 if __name__ == '__main__':
+    # kept out of module scope: parse workers start by importing this module again
+    migrate()
+    # small or empty tables make MySQL pick full scans anyway, so this is only worth it against production-sized data
+    if explain_on_startup:
+        for name in explain():
+            print('Warning: %s does a full table scan' % name)
+    custom_prefixes.update(query.sync.get_prefixes())
     # status_change.start()
     problems_rankings.setup(bot)
     contests.setup(bot)
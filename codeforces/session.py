@@ -1,7 +1,8 @@
-import bs4 as bs
 import hashlib
 from time import time
 import random as rand
+from utils import htmlparse
+from utils.htmlparse import parsec
 from utils.webclient import webc
 from aiohttp import ClientError
 
@@ -37,11 +38,7 @@ class Session:
     async def generate(self):
         try:
             response = await webc.webget_text(self.BASE_URL + '/profile/' + self.account)
-            soup = bs.BeautifulSoup(response, 'lxml')
-            if soup.find('h1').find('a').find('span') is not None:
-                self.handle = soup.find('h1').find('a').contents[0].contents[0] + soup.find('h1').find('a').contents[1]
-            else:
-                self.handle = soup.find('h1').find('a').contents[0]
+            self.handle = await parsec.run(htmlparse.parse_cf_profile_handle, response)
         except ClientError:
             raise InvalidCodeforcesSessionException
         except AttributeError:
@@ -69,8 +66,7 @@ class Session:
                 response = await webc.webget_text('https://codeforces.com/problemsets/' + submission_data[0]['problem']['problemsetName'] + '/submission/99999/' + str(submission_data[0]['id']))
         except ClientError:
             raise InvalidCodeforcesSessionException
-        soup = bs.BeautifulSoup(response, 'lxml')
-        if soup.find('title').contents[0] == 'Codeforces':
+        source = await parsec.run(htmlparse.parse_cf_submission_source, response)
+        if source is None:
             raise PrivateSubmissionException
-        source = soup.find('body').find('pre').contents[0]
         return self.hash in source
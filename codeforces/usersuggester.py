@@ -9,13 +9,15 @@ class UserSuggester(object):
         self.handle = handle
         self.points_min = 1
         self.points_max = 50
-        self.expand_up = True
+        self.time = 0
+        self.refreshing = False
     
     async def update_pp_range(self):
         response = await webc.webget_json('https://codeforces.com/api/user.status?handle=%s&from=1&count=100' % self.handle)
+        # stamped on failure too, otherwise every $random for this handle would start another refresh
+        self.time = time()
         if response['status'] != 'OK':
             return
-        self.time = time()
         submissions = response['result']
         points = []
         for submission in submissions:
@@ -27,7 +29,7 @@ class UserSuggester(object):
             self.points_min = 0
             self.points_max = 500
             return
-        points.sort()
+        points.sort(reverse=True)
         points_len = min(len(points), 100)
 
         self.points_max = 2*sum(points[0:points_len//2])//points_len
@@ -36,10 +38,13 @@ class UserSuggester(object):
     def get_pp_range(self):
         return tuple(map(str, (self.points_min, self.points_max)))
 
-    def expand_pp_range(self):
-        if self.points_max != 50 and self.expand_up:
-            self.points_max = min(self.points_max+500, 4000)
-            self.expand_up = False
-        else:
-            self.points_min = max(0, self.points_min-250)
-            self.expand_up = True
+    def expanded_pp_ranges(self):
+        points_min, points_max = self.points_min, self.points_max
+        expand_up = True
+        while points_min > 0 or points_max < 4000:
+            if (expand_up and points_max < 4000) or points_min <= 0:
+                points_max = min(points_max+500, 4000)
+            else:
+                points_min = max(0, points_min-250)
+            expand_up = not expand_up
+            yield points_min, points_max
@@ -5,11 +5,15 @@ from time import time
 import random as rand
 from datetime import datetime, timedelta
 import json
-import bs4 as bs
 import pytz
+import aiohttp
+import asyncio
+import traceback
 from connector import mySQLConnection as query
 from utils.onlinejudges import OnlineJudges, NoSuchOJException
-import requests
+from utils import htmlparse
+from utils.htmlparse import parsec
+from utils.webclient import webc
 
 
 class Contest(object):
@@ -113,13 +117,13 @@ class ContestCog(commands.Cog):
     def set_time(self):
         self.fetch_time = time()
 
-    def parse_dmoj_contests(self):
-        contest_req = requests.get('https://dmoj.ca/api/v2/contests').json()
+    async def parse_dmoj_contests(self):
+        contest_req = await webc.webget_json('https://dmoj.ca/api/v2/contests', background=True, cache=True)
         contests = contest_req['data']['objects']
         for details in contests:
             name = details['key']
             if datetime.strptime(details['start_time'].replace(':', ''), '%Y-%m-%dT%H%M%S%z').timestamp() > time():
-                spec = requests.get('https://dmoj.ca/api/v2/contest/' + name).json()['data']['object']
+                spec = (await webc.webget_json('https://dmoj.ca/api/v2/contest/' + name, background=True, cache=True))['data']['object']
                 url = 'https://dmoj.ca/contest/' + name
                 contest_data = {
                     'title': ':trophy: %s' % details['name'],
@@ -136,8 +140,8 @@ class ContestCog(commands.Cog):
                 contest_data['Format'] = spec['format']['name']
                 self.dmoj_contests.append(Contest(contest_data))
 
-    def parse_cf_contests(self):
-        contests = requests.get('https://codeforces.com/api/contest.list').json()
+    async def parse_cf_contests(self):
+        contests = await webc.webget_json('https://codeforces.com/api/contest.list', background=True, cache=True)
         for contest in range(len(contests.get('result', []))):
             details = contests['result'][contest]
             if details['phase'] == 'BEFORE':
@@ -152,24 +156,23 @@ class ContestCog(commands.Cog):
                 }
                 self.cf_contests.append(Contest(contest_data))
 
-    def parse_atcoder_contests(self):
-        contests = requests.get('https://atcoder.jp/contests/?lang=en').text
-        soup = bs.BeautifulSoup(contests, 'lxml')
-        for contest in soup.find_all('table')[1 + len(soup.find_all('div', attrs={'id': 'contest-table-action'}))].find('tbody').find_all('tr'):
-            details = contest.find_all('td')
-            if datetime.strptime(details[0].find('a').find('time').contents[0], '%Y-%m-%d %H:%M:%S%z').timestamp() > time():
+    async def parse_atcoder_contests(self):
+        contests = await webc.webget_text('https://atcoder.jp/contests/?lang=en', background=True, cache=True)
+        for details in await parsec.run(htmlparse.parse_atcoder_contests, contests):
+            start_time = datetime.strptime(details['start_time'], '%Y-%m-%d %H:%M:%S%z')
+            if start_time.timestamp() > time():
                 contest_data = {
-                    'title': ':trophy: %s' % details[1].find('a').contents[0],
-                    'description': 'https://atcoder.jp' + details[1].find('a')['href'],
+                    'title': ':trophy: %s' % details['title'],
+                    'description': details['url'],
                     'oj': 'atcoder',
-                    'Start Time': datetime.strptime(details[0].find('a').find('time').contents[0], '%Y-%m-%d %H:%M:%S%z').strftime('%Y-%m-%d %H:%M:%S%z'),
-                    'Duration':  details[2].contents[0] + ':00',
-                    'Rated Range': details[3].contents[0]
+                    'Start Time': start_time.strftime('%Y-%m-%d %H:%M:%S%z'),
+                    'Duration':  details['duration'] + ':00',
+                    'Rated Range': details['rated_range']
                 }
                 self.atcoder_contests.append(Contest(contest_data))
 
-    def parse_external_contest_api(self):
-        contests = requests.get('https://kontests.net/api/v1/all').json()
+    async def parse_external_contest_api(self):
+        contests = await webc.webget_json('https://kontests.net/api/v1/all', background=True, cache=True)
         for contest in contests:
             if contest['site'] == 'LeetCode':
                 self.parse_leetcode_contest(contest)
@@ -281,7 +284,7 @@ class ContestCog(commands.Cog):
             channel = ctx.message.channel
             determiner = 'This'
 
-        exists = query.exists('subscriptions_contests', 'channel_id', channel.id)
+        exists = await query.exists('subscriptions_contests', 'channel_id', channel.id)
 
         old_sub_int = None
         old_sub_bin = None
@@ -299,7 +302,7 @@ class ContestCog(commands.Cog):
 
         sub_bin = '0'*len(self.onlineJudges.contest_judges)
         if exists:
-            old_sub_int = query.get_subbed_ojs(channel.id)
+            old_sub_int = await query.get_subbed_ojs(channel.id)
             old_sub_bin = '{0:b}'.format(old_sub_int).zfill(len(self.onlineJudges.contest_judges))
             sub_bin = old_sub_bin
         selected = 'the selected '
@@ -316,8 +319,8 @@ class ContestCog(commands.Cog):
             await ctx.send(ctx.message.author.display_name + ', %s channel is already subscribed to %scontest notifications.' % (determiner, selected))
             return
         if not exists:
-            query.sub_channel(channel.id)
-        query.update_subbed_ojs(channel.id, sub_int)
+            await query.sub_channel(channel.id)
+        await query.update_subbed_ojs(channel.id, sub_int)
         await ctx.send(ctx.message.author.display_name + ', ' + channel.mention + ' subscribed to %scontest notifications.' % selected)
 
     @commands.command()
@@ -325,8 +328,8 @@ class ContestCog(commands.Cog):
     async def subs(self, ctx):
         clist = ctx.message.author.display_name + ', Contest notification channels in this server:\n'
         for text_channel in ctx.message.guild.text_channels:
-            if query.exists('subscriptions_contests', 'channel_id', text_channel.id):
-                sub_bin = '{0:b}'.format(query.get_subbed_ojs(text_channel.id)).zfill(len(self.onlineJudges.contest_judges))
+            if await query.exists('subscriptions_contests', 'channel_id', text_channel.id):
+                sub_bin = '{0:b}'.format(await query.get_subbed_ojs(text_channel.id)).zfill(len(self.onlineJudges.contest_judges))
                 ojs = []
                 for i, b in enumerate(sub_bin):
                     if b == '1':
@@ -347,7 +350,7 @@ class ContestCog(commands.Cog):
             channel = ctx.message.channel
             determiner = 'This'
 
-        exists = query.exists('subscriptions_contests', 'channel_id', channel.id)
+        exists = await query.exists('subscriptions_contests', 'channel_id', channel.id)
 
         if not exists:
             await ctx.send(ctx.message.author.display_name + ', %s channel is already not subscribed to contest notifications.' % determiner)
@@ -369,7 +372,7 @@ class ContestCog(commands.Cog):
 
         sub_bin = '1'*len(self.onlineJudges.contest_judges)
         if exists:
-            old_sub_int = query.get_subbed_ojs(channel.id)
+            old_sub_int = await query.get_subbed_ojs(channel.id)
             old_sub_bin = '{0:b}'.format(old_sub_int).zfill(len(self.onlineJudges.contest_judges))
             sub_bin = old_sub_bin
         if len(ojs) == 0:
@@ -385,10 +388,10 @@ class ContestCog(commands.Cog):
             return
             
         if sub_int == 0:
-            query.unsub_channel(channel.id)
+            await query.unsub_channel(channel.id)
             await ctx.send(ctx.message.author.display_name + ', ' + channel.mention + ' is no longer a contest notification channel.')
         else:
-            query.update_subbed_ojs(channel.id, sub_int)
+            await query.update_subbed_ojs(channel.id, sub_int)
             await ctx.send(ctx.message.author.display_name + ', ' + channel.mention + ' has been unsubscribed from contest notifications from the selected online judges')
 
     def is_upcoming(self, contest):
@@ -401,41 +404,32 @@ class ContestCog(commands.Cog):
             return datetime.strptime(contest.asdict()['Start Time'], '%Y-%m-%d %H:%M:%S%z') > datetime.now(pytz.UTC) - timedelta(days=7)
         return datetime.strptime(contest.asdict()['Start Time'], '%Y-%m-%d %H:%M:%S') > datetime.now() - timedelta(days=7)
 
-    @tasks.loop(minutes=7)
-    async def refresh_contests(self):
-        try:
-            self.reset_contest('dmoj')
-            self.parse_dmoj_contests()
-        except:
-            pass
-
-        try:
-            self.reset_contest('codeforces')
-            self.parse_cf_contests()
-        except:
-            pass
-
+    async def refresh_contests_of(self, parse, *ojs):
+        for oj in ojs:
+            self.reset_contest(oj)
         try:
-            self.reset_contest('atcoder')
-            self.parse_atcoder_contests()
-        except:
+            await parse()
+        except (aiohttp.ClientError, asyncio.TimeoutError):
             pass
+        except Exception:
+            traceback.print_exc()
 
-        try:
-            self.reset_contest('leetcode')
-            self.reset_contest('codechef')
-            self.reset_contest('topcoder')
-            self.parse_external_contest_api()
-        except:
-            pass
+    @tasks.loop(minutes=7)
+    async def refresh_contests(self):
+        await asyncio.gather(
+            self.refresh_contests_of(self.parse_dmoj_contests, 'dmoj'),
+            self.refresh_contests_of(self.parse_cf_contests, 'codeforces'),
+            self.refresh_contests_of(self.parse_atcoder_contests, 'atcoder'),
+            self.refresh_contests_of(self.parse_external_contest_api, 'leetcode', 'codechef', 'topcoder')
+        )
 
         self.set_time()
         self.generate_stream()
 
         new_contests = list(set(self.contest_objects).difference(set(self.contest_cache)))
 
-        for channel_id in query.get_all_subs():
-            sub_bin = '{0:b}'.format(query.get_subbed_ojs(channel_id)).zfill(len(self.onlineJudges.contest_judges))
+        for channel_id in await query.get_all_subs():
+            sub_bin = '{0:b}'.format(await query.get_subbed_ojs(channel_id)).zfill(len(self.onlineJudges.contest_judges))
             channel_subbed = []
             for new_contest in new_contests:
                 if sub_bin[self.onlineJudges.contest_judges.index(new_contest.asdict()['oj'])] == '1':
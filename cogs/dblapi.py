@@ -16,7 +16,7 @@ class DiscordBotLists(commands.Cog):
     @tasks.loop(minutes=30)
     async def post_guild_count(self):
         self.data['server_count'] = len(self.bot.guilds)
-        response = await webc.webget_json('https://botblock.org/api/count', json=self.data, headers={'Content-type':'application/json', 'Accept':'application/json'})
+        response = await webc.webpost_json('https://botblock.org/api/count', json=self.data, headers={'Content-type':'application/json', 'Accept':'application/json'}, background=True)
         with open('log.txt', 'w+') as log:
             print(response, file=log)
 
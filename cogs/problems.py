@@ -2,7 +2,9 @@ import discord
 from discord.ext import commands, tasks
 from datetime import datetime, date
 import random as rand
-import bs4 as bs
+import aiohttp
+import asyncio
+import traceback
 from dmoj.session import Session as DMOJSession
 from dmoj.session import InvalidDMOJSessionException, VerificationException
 from dmoj.language import Language
@@ -13,9 +15,16 @@ from codeforces.usersuggester import UserSuggester as CodeforcesUserSuggester
 from connector import mySQLConnection as query
 from utils.onlinejudges import OnlineJudges, NoSuchOJException
 from utils.country import Country, InvalidCountryException
+from utils import htmlparse
+from utils.htmlparse import parsec
+from utils.catalog import Catalog, DMOJProblem, CodeforcesProblem, AtCoderProblem, CSESProblem, SzkopulProblem, LeetCodeProblem
+from utils.jsonstream import iter_items, value_at
+from utils.lrucache import LRUCache
+from utils.solvedstore import solved_store
 from utils.webclient import webc
-import requests
 import json
+import hashlib
+import heapq
 import re
 from time import time
 
@@ -63,23 +72,30 @@ class InvalidURLException(Exception):
         pass
 
 class ProblemCog(commands.Cog):
-    problems_by_points = {'dmoj':{}, 'codeforces':{}, 'atcoder':{}}
-
-    dmoj_problems = {}
-    cf_problems = None
-    at_problems = None
-    cses_problems = []
-    szkopul_problems = {}
-    leetcode_problems = []
-    leetcode_problems_paid = []
+    catalogs = {
+        'dmoj': Catalog(),
+        'codeforces': Catalog(),
+        'atcoder': Catalog(),
+        'cses': Catalog(),
+        'szkopul': Catalog(),
+        'leetcode': Catalog()
+    }
+    szkopul_digest = None
+    max_problem_set = 10
 
     dmoj_sessions = {}
     cf_sessions = {}
 
-    dmoj_user_suggests = {}
-    cf_user_suggests = {}
+    user_suggests = {
+        'dmoj': LRUCache(maxsize=1024, ttl=7*24*60*60),
+        'codeforces': LRUCache(maxsize=1024, ttl=7*24*60*60)
+    }
+    suggester_classes = {
+        'dmoj': DMOJUserSuggester,
+        'codeforces': CodeforcesUserSuggester
+    }
+    suggester_refresh = 6*60*60
 
-    szkopul_page = 1
     language = Language()
     onlineJudges = OnlineJudges()
 
@@ -102,6 +118,7 @@ class ProblemCog(commands.Cog):
 
     def __init__(self, bot):
         self.bot = bot
+        self.load_snapshots()
         self.refresh_dmoj_problems.start()
         self.refresh_cf_problems.start()
         self.refresh_atcoder_problems.start()
@@ -109,250 +126,265 @@ class ProblemCog(commands.Cog):
         self.refresh_cses_problems.start()
         self.refresh_szkopul_problems.start()
 
+    def cog_unload(self):
+        parsec.shutdown(wait=False)
+
+    def status_line(self, oj):
+        breaker = webc.breaker(self.onlineJudges.problem_hosts[oj])
+        state = breaker.state
+        if state == breaker.OPEN:
+            status = 'Unable to connect, retrying in %ds' % breaker.retry_in()
+        elif state == breaker.HALF_OPEN:
+            status = 'Reconnecting'
+        else:
+            status = ('Unable to connect', 'OK', 'Loaded from snapshot')[self.statuses[oj]]
+        return '%s status: %s (circuit %s, %d%% recent errors). Catalog v%d, %d problems. Last fetched, %d minutes ago' % (self.onlineJudges.formal_names[oj], status, state, round(breaker.error_rate()*100), self.catalogs[oj].version, len(self.catalogs[oj]), (time()-self.fetch_times[oj])//60)
+
     @commands.command()
     async def oj(self, ctx, oj: str=''):
         if oj == '':
             status_list = '```'
             for oj in self.onlineJudges.problem_judges:
-                status_list += '%s status: %s. Last fetched, %d minutes ago\n' % (self.onlineJudges.formal_names[oj], 'OK' if self.statuses[oj] == 1 else 'Unable to connect', (time()-self.fetch_times[oj])//60)
+                status_list += self.status_line(oj) + '\n'
             await ctx.send(status_list[:-1] + '```')
         else:
             try:
                 oj = self.onlineJudges.get_oj(oj)
                 if oj not in self.onlineJudges.problem_judges:
                     raise NoSuchOJException(oj)
-                await ctx.send('```%s status: %s. Last fetched, %d minutes ago```' % (self.onlineJudges.formal_names[oj], 'OK' if self.statuses[oj] == 1 else 'Unable to connect', (time()-self.fetch_times[oj])//60))
+                await ctx.send('```%s```' % self.status_line(oj))
             except NoSuchOJException:
                 await ctx.send(ctx.message.author.display_name + ', Sorry, no online judge found. Search only for online judges used for getting problems this bot ' + self.onlineJudges.problem_judges_str())
 
-
-    async def parse_dmoj_problems(self):
-        try:
-            problem_req = await webc.webget_json('https://dmoj.ca/api/v2/problems')
-            problems = problem_req['data']['objects']
-            self.statuses['dmoj'] =  1
-            self.dmoj_problems = {}
-            for problem in problems:
-                self.dmoj_problems[problem['code']] = problem
-            self.problems_by_points['dmoj'] = {}
-            for name, details in self.dmoj_problems.items():
-                if details['points'] not in self.problems_by_points['dmoj']:
-                    self.problems_by_points['dmoj'][details['points']] = {}
-                self.problems_by_points['dmoj'][details['points']][name] = details
-        except Exception as e:
-            self.statuses['dmoj'] = 0
-            raise e
-
-    def parse_cf_problems(self):
-        try:
-            problems = requests.get('https://codeforces.com/api/problemset.problems').json()
-            self.statuses['codeforces'] =  1
-            self.cf_problems = problems['result']['problems']
-            self.problems_by_points['codeforces'] = {}
-            for details in self.cf_problems:
-                if 'rating' in details.keys():
-                    if details['rating'] not in self.problems_by_points['codeforces']:
-                        self.problems_by_points['codeforces'][details['rating']] = []
-                    self.problems_by_points['codeforces'][details['rating']].append(details)
-        except Exception as e:
-            self.statuses['codeforces'] = 0
-            raise e
-
-    def parse_atcoder_problems(self):
-        try:
-            problems = requests.get('https://kenkoooo.com/atcoder/resources/merged-problems.json').json()
-            self.statuses['atcoder'] =  1
-            self.atcoder_problems = problems
-            self.problems_by_points['atcoder'] = {}
-            for details in problems:
-                if details['point']:
-                    if details['point'] not in self.problems_by_points['atcoder']:
-                        self.problems_by_points['atcoder'][details['point']] = []
-                    self.problems_by_points['atcoder'][details['point']].append(details)
-        except Exception as e:
-            self.statuses['atcoder'] = 0
-            raise e
-
-    def parse_cses_problems(self):
+    def snapshot_path(self, oj):
+        return 'data/snapshots/%s.pickle' % oj
+
+    def load_snapshots(self):
+        for oj in self.catalogs:
+            catalog, fetched_at = Catalog.load_snapshot(self.snapshot_path(oj))
+            if catalog is None:
+                continue
+            catalog.index_titles()
+            self.catalogs[oj] = catalog
+            self.statuses[oj] = 2
+            self.fetch_times[oj] = fetched_at
+
+    def publish(self, oj, catalog):
+        if catalog is not self.catalogs[oj]:
+            catalog.version = self.catalogs[oj].version + 1
+            self.catalogs[oj] = catalog
+
+    async def refresh_problems(self, oj, parse):
         try:
-            problems = requests.get('https://cses.fi/problemset/list/').text
-            self.statuses['cses'] =  1
-            self.cses_problems = []
-            soup = bs.BeautifulSoup(problems, 'lxml')
-            task_lists = soup.find_all('ul', attrs={'class' : 'task-list'})
-            task_groups = soup.find_all('h2')
-            for index in range(1, len(task_groups)):
-                tasks = task_lists[index].find_all('li', attrs={'class' : 'task'})
-                for task in tasks:
-                    name = task.find('a').contents[0]
-                    url = 'https://cses.fi' + task.find('a').attrs['href']
-                    id = url.split('/')[-1]
-                    rate = task.find('span', attrs={'class' : 'detail'}).contents[0]
-                    group = task_groups[index].contents[0]
-                    cses_data = {
-                        'id': id,
-                        'name': name,
-                        'url': url,
-                        'rate': rate,
-                        'group': group
-                    }
-                    self.cses_problems.append(cses_data)
-        except Exception as e:
-            self.statuses['cses'] = 0
-            raise e
-
-    def parse_szkopul_problems(self):
-        try:
-            problems = requests.get('https://szkopul.edu.pl/problemset/?page=%d' % self.szkopul_page).text
-            self.statuses['szkopul'] =  1
-            soup = bs.BeautifulSoup(problems, 'lxml')
-            rows = soup.find_all('tr')
-            if len(rows) == 1:
-                self.szkopul_problems = [p for p in self.szkopul_problems if p['updated']]
-                return
-            if self.szkopul_page == 1:
-                for problem in self.szkopul_problems:
-                    problem['updated'] = False
-            for row in rows:
-                data = row.find_all('td')
-                if data == []:
-                    continue
-                id = data[0].contents[0]
-                title = data[1].find('a').contents[0]
-                url = 'https://szkopul.edu.pl' + data[1].find('a').attrs['href']
-                tags = []
-                for tag in data[2].find_all('a'):
-                    tags.append(tag.contents[0])
-                submitters = data[3].contents[0]
-                problem_data = {
-                    'id': id,
-                    'title': title,
-                    'url': url,
-                    'tags': tags,
-                    'submitters': submitters,
-                    'updated': True
-                }
-                if int(submitters) > 0:
-                    problem_data['percent_correct'] = data[4].contents[0]
-                    problem_data['average'] = data[5].contents[0]
-                self.szkopul_problems[id] = problem_data
-            self.szkopul_page += 1
-        except Exception as e:
-            self.statuses['szkopul'] = 0
-            raise e
-
-    def parse_leetcode_problems(self):
+            catalog = await parse()
+            unchanged = catalog is self.catalogs[oj]
+            # the title index takes most of a second on large catalogs, so it is built before publishing and off the loop
+            await asyncio.get_event_loop().run_in_executor(None, catalog.index_titles)
+            self.publish(oj, catalog)
+            self.statuses[oj] = 1
+            self.fetch_times[oj] = time()
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            self.statuses[oj] = 0
+            raise
+        except Exception:
+            self.statuses[oj] = 0
+            traceback.print_exc()
+            return
+        if unchanged:
+            return
         try:
-            problems = requests.get('https://leetcode.com/api/problems/algorithms/').json()
-            self.statuses['leetcode'] = 1
-            self.leetcode_problems_paid = []
-            self.leetcode_problems = []
-            problemlist = problems['stat_status_pairs']
-            for problem in problemlist:
-                id = problem['stat']['frontend_question_id']
-                title = problem['stat']['question__title']
-                url = 'https://leetcode.com/problems/' + problem['stat']['question__title_slug']
-                total_acs = problem['stat']['total_acs']
-                total_submitted = problem['stat']['total_submitted']
-                level = problem['difficulty']['level']
-                paid = problem['paid_only']
-                problem_data = {
-                    'id': id,
-                    'title': title,
-                    'url': url,
-                    'total_acs': total_acs,
-                    'total_submitted': total_submitted,
-                    'level': level,
-                    'paid': paid
-                }
-                if paid:
-                    self.leetcode_problems_paid.append(problem_data)
-                else:
-                    self.leetcode_problems.append(problem_data)
-        except Exception as e:
-            self.statuses['leetcode'] = 0
-            raise e
+            await asyncio.get_event_loop().run_in_executor(None, self.catalogs[oj].save_snapshot, self.snapshot_path(oj), self.fetch_times[oj])
+        except OSError:
+            traceback.print_exc()
+
+    def patch_catalog(self, oj, problems):
+        # a body that parses to the same problems keeps the current catalog, its version and its title index
+        catalog, (added, removed, changed) = self.catalogs[oj].patched(problems)
+        if added or removed or changed:
+            print('%s problems synced: %d added, %d removed, %d changed' % (self.onlineJudges.formal_names[oj], added, removed, changed))
+        return catalog
+
+    async def fetch_dmoj_problem_page(self, page):
+        return await webc.webget_raw('https://dmoj.ca/api/v2/problems?page=%d' % page, background=True, cache=True)
 
-    def embed_dmoj_problem(self, name, prob, suggested=False):
+    async def parse_dmoj_problems(self):
+        first = await self.fetch_dmoj_problem_page(1)
+        pages = [first] + list(await asyncio.gather(*(self.fetch_dmoj_problem_page(page) for page in range(2, value_at(first, 'data.total_pages', 1)+1))))
+        return self.patch_catalog('dmoj', (DMOJProblem.from_json(problem) for page in pages for problem in iter_items(page, 'data.objects')))
+
+    async def parse_cf_problems(self):
+        problems = await webc.webget_raw('https://codeforces.com/api/problemset.problems', background=True, cache=True, if_modified=True)
+        if problems is None:
+            return self.catalogs['codeforces']
+        return self.patch_catalog('codeforces', map(CodeforcesProblem.from_json, iter_items(problems, 'result.problems')))
+
+    async def parse_atcoder_problems(self):
+        problems = await webc.webget_raw('https://kenkoooo.com/atcoder/resources/merged-problems.json', background=True, cache=True, if_modified=True)
+        if problems is None:
+            return self.catalogs['atcoder']
+        return self.patch_catalog('atcoder', map(AtCoderProblem.from_json, iter_items(problems)))
+
+    async def parse_cses_problems(self):
+        problems = await webc.webget_text('https://cses.fi/problemset/list/', background=True, cache=True, if_modified=True)
+        if problems is None:
+            return self.catalogs['cses']
+        return self.patch_catalog('cses', map(CSESProblem.from_json, await parsec.run(htmlparse.parse_cses_problems, problems)))
+
+    async def fetch_szkopul_page(self, page):
+        return await webc.webget_text('https://szkopul.edu.pl/problemset/?page=%d' % page, background=True, cache=True)
+
+    async def parse_szkopul_problems(self):
+        first = await self.fetch_szkopul_page(1)
+        pages = await parsec.run(htmlparse.parse_szkopul_page_count, first)
+        texts = [first] + list(await asyncio.gather(*(self.fetch_szkopul_page(page) for page in range(2, pages+1))))
+        digest = hashlib.sha1('\0'.join(texts).encode('utf-8')).hexdigest()
+        if digest == self.szkopul_digest:
+            return self.catalogs['szkopul']
+        rows = await asyncio.gather(*(parsec.run(htmlparse.parse_szkopul_problems, text) for text in texts))
+        catalog, (added, removed, changed) = self.catalogs['szkopul'].patched(SzkopulProblem.from_json(problem) for page in rows for problem in page)
+        self.szkopul_digest = digest
+        if added or removed or changed:
+            print('Szkopul problems synced from %d pages: %d added, %d removed, %d changed' % (pages, added, removed, changed))
+        return catalog
+
+    async def parse_leetcode_problems(self):
+        problems = await webc.webget_raw('https://leetcode.com/api/problems/algorithms/', background=True, cache=True, if_modified=True)
+        if problems is None:
+            return self.catalogs['leetcode']
+        return self.patch_catalog('leetcode', map(LeetCodeProblem.from_json, iter_items(problems, 'stat_status_pairs')))
+
+    def embed_dmoj_problem(self, prob, suggested=False):
         embed = discord.Embed()
         embed.colour = self.onlineJudges.colours['dmoj']
-        url = 'https://dmoj.ca/problem/' + name
         embed.set_thumbnail(url=self.onlineJudges.thumbnails['dmoj'])
-        embed.add_field(name='Points', value=prob['points'], inline=False)
-        embed.add_field(name='Partials', value=('Yes' if prob['partial'] else 'No'), inline=False)
-        embed.add_field(name='Group', value=prob['group'], inline=False)
-        embed.add_field(name='Types', value='||'+', '.join(prob['types'])+'||', inline=False)
-        return ('[:thumbsup: SUGGESTED] ' if suggested else '') + prob['name'], url, embed
+        embed.add_field(name='Points', value=prob.points, inline=False)
+        embed.add_field(name='Partials', value=('Yes' if prob.partial else 'No'), inline=False)
+        embed.add_field(name='Group', value=prob.group, inline=False)
+        embed.add_field(name='Types', value='||'+', '.join(prob.tags)+'||', inline=False)
+        return ('[:thumbsup: SUGGESTED] ' if suggested else '') + prob.name, prob.url, embed
 
     def embed_cf_problem(self, prob, suggested=False):
         embed = discord.Embed()
         embed.colour = self.onlineJudges.colours['codeforces']
-        url = 'https://codeforces.com/problemset/problem/' + str(prob['contestId']) + '/' + str(prob['index'])
         embed.set_thumbnail(url=self.onlineJudges.thumbnails['codeforces'])
-        embed.add_field(name='Type', value=prob['type'], inline=False)
-        if 'points' in prob.keys():
-            embed.add_field(name='Points', value=prob['points'], inline=False)
-        if 'rating' in prob.keys():
-            embed.add_field(name='Rating', value=prob['rating'], inline=False)
-        embed.add_field(name='Tags', value='||'+', '.join(prob['tags'])+'||', inline=False)
-        return ('[:thumbsup: SUGGESTED] ' if suggested else '') + prob['name'], url, embed
+        embed.add_field(name='Type', value=prob.type, inline=False)
+        if prob.score is not None:
+            embed.add_field(name='Points', value=prob.score, inline=False)
+        if prob.points is not None:
+            embed.add_field(name='Rating', value=prob.points, inline=False)
+        embed.add_field(name='Tags', value='||'+', '.join(prob.tags)+'||', inline=False)
+        return ('[:thumbsup: SUGGESTED] ' if suggested else '') + prob.name, prob.url, embed
 
     def embed_atcoder_problem(self, prob):
         embed = discord.Embed()
         embed.colour = self.onlineJudges.colours['atcoder']
-        url = 'https://atcoder.jp/contests/' + prob['contest_id'] + '/tasks/' + prob['id']
         embed.set_thumbnail(url=self.onlineJudges.thumbnails['atcoder'])
-        if prob['point']:
-            embed.add_field(name='Points', value=prob['point'], inline=False)
-        embed.add_field(name='Solver Count', value=prob['solver_count'], inline=False)
-        return prob['title'], url, embed
+        if prob.points:
+            embed.add_field(name='Points', value=prob.points, inline=False)
+        embed.add_field(name='Solver Count', value=prob.solver_count, inline=False)
+        return prob.name, prob.url, embed
 
     def embed_cses_problem(self, prob):
         embed = discord.Embed()
         embed.colour = self.onlineJudges.colours['cses']
         embed.set_thumbnail(url=self.onlineJudges.thumbnails['cses'])
-        embed.add_field(name='Success Rate', value=prob['rate'], inline=False)
-        embed.add_field(name='Group', value='||' + prob['group'] + '||', inline=False)
-        return prob['name'], prob['url'], embed
+        embed.add_field(name='Success Rate', value=prob.rate, inline=False)
+        embed.add_field(name='Group', value='||' + prob.group + '||', inline=False)
+        return prob.name, prob.url, embed
 
     def embed_szkopul_problem(self, prob):
         embed = discord.Embed()
         embed.colour = self.onlineJudges.colours['szkopul']
         embed.set_thumbnail(url=self.onlineJudges.thumbnails['szkopul'])
-        if len(prob['tags']) > 0:
-            embed.add_field(name='Tags', value=', '.join(prob['tags']), inline=False)
-        embed.add_field(name='Submitters', value=prob['submitters'], inline=False)
-        if 'percent_correct' in prob:
-            embed.add_field(name='% Correct', value=prob['percent_correct'], inline=False)
-        if 'average' in prob:
-            embed.add_field(name='Average', value=prob['average'], inline=False)
-        return prob['title'], prob['url'], embed
+        if len(prob.tags) > 0:
+            embed.add_field(name='Tags', value=', '.join(prob.tags), inline=False)
+        embed.add_field(name='Submitters', value=prob.submitters, inline=False)
+        if prob.percent_correct is not None:
+            embed.add_field(name='% Correct', value=prob.percent_correct, inline=False)
+        if prob.average is not None:
+            embed.add_field(name='Average', value=prob.average, inline=False)
+        return prob.name, prob.url, embed
 
     def embed_leetcode_problem(self, prob):
         embed = discord.Embed()
         embed.colour = self.onlineJudges.colours['leetcode']
         embed.set_thumbnail(url=self.onlineJudges.thumbnails['leetcode'])
-        embed.add_field(name='Total ACs', value=prob['total_acs'], inline=False)
-        embed.add_field(name='Total Submitted', value=prob['total_submitted'], inline=False)
-        embed.add_field(name='Level', value=prob['level'], inline=False)
-        embed.add_field(name='Paid?', value='Yes' if prob['paid'] else 'No', inline=False)
-        return prob['title'], prob['url'], embed
+        embed.add_field(name='Total ACs', value=prob.total_acs, inline=False)
+        embed.add_field(name='Total Submitted', value=prob.total_submitted, inline=False)
+        embed.add_field(name='Level', value=prob.points, inline=False)
+        embed.add_field(name='Paid?', value='Yes' if prob.paid else 'No', inline=False)
+        return prob.name, prob.url, embed
+
+    def embed_problem(self, prob, suggested=False):
+        if prob.judge == 'dmoj':
+            return self.embed_dmoj_problem(prob, suggested)
+        elif prob.judge == 'codeforces':
+            return self.embed_cf_problem(prob, suggested)
+        elif prob.judge == 'atcoder':
+            return self.embed_atcoder_problem(prob)
+        elif prob.judge == 'cses':
+            return self.embed_cses_problem(prob)
+        elif prob.judge == 'szkopul':
+            return self.embed_szkopul_problem(prob)
+        return self.embed_leetcode_problem(prob)
 
-    async def get_random_problem(self, oj=None, points=None, maximum=None, iden=None, paid=False):
+    def embed_problem_set(self, problems, suggested=False):
+        if len(problems) == 1:
+            return self.embed_problem(problems[0], suggested)
+        embed = discord.Embed()
+        embed.colour = self.onlineJudges.colours[problems[0].judge]
+        embed.set_thumbnail(url=self.onlineJudges.thumbnails[problems[0].judge])
+        for index, prob in enumerate(problems, 1):
+            details = prob.url
+            if prob.points is not None:
+                details += '\n%s: %s' % ('Rating' if prob.judge == 'codeforces' else 'Level' if prob.judge == 'leetcode' else 'Points', prob.points)
+            if len(prob.tags) > 0:
+                details += '\nTags: ||' + ', '.join(prob.tags) + '||'
+            embed.add_field(name='%d. %s' % (index, prob.name), value=details, inline=False)
+        title = '%d %s problems' % (len(problems), self.onlineJudges.formal_names[problems[0].judge])
+        return ('[:thumbsup: SUGGESTED] ' if suggested else '') + title, 'Practice set', embed
+
+    async def revalidate_suggester(self, suggester):
+        try:
+            await suggester.update_pp_range()
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            pass
+        finally:
+            suggester.refreshing = False
+
+    async def get_suggester(self, oj, handle):
+        suggester = self.user_suggests[oj].get(handle.lower())
+        if suggester is None:
+            suggester = self.suggester_classes[oj](handle)
+            await suggester.update_pp_range()
+            self.user_suggests[oj].put(handle.lower(), suggester)
+        elif time() - suggester.time > self.suggester_refresh and not suggester.refreshing:
+            # serve the current range and refresh it in the background
+            suggester.refreshing = True
+            asyncio.ensure_future(self.revalidate_suggester(suggester))
+        return suggester
+
+    async def get_random_problem(self, oj=None, points=None, maximum=None, iden=None, paid=False, tags=(), count=1, spread=False):
         if oj is None:
             oj = rand.choice(self.onlineJudges.problem_judges)
 
         oj = self.onlineJudges.get_oj(oj)
 
-        if oj == 'cses' and points is not None:
+        if oj not in self.catalogs:
+            raise NoSuchOJException(oj)
+        elif oj == 'cses' and points is not None:
             raise InvalidParametersException(cses=True)
         elif oj == 'szkopul' and points is not None:
             raise InvalidParametersException(szkopul=True)
 
-        temp_dmoj_problems = {}
-        temp_cf_problems = []
-        user_data = query.get_user(iden)
+        catalog = self.catalogs[oj]
+        if len(catalog) == 0 and oj in ('dmoj', 'codeforces', 'atcoder'):
+            raise OnlineJudgeHTTPException(self.onlineJudges.formal_names[oj])
+
+        solved = None
+        user_data = await query.get_user(iden)
         suggestions_on = False
+        suggester = None
 
         if iden is not None:
             suggestions_on = user_data[iden]['can_suggest'] and points is None and ((
@@ -361,64 +393,16 @@ class ProblemCog(commands.Cog):
                     oj == 'codeforces' and user_data[iden]['codeforces'] is not None
                 ))
             if suggestions_on:
-                if oj == 'dmoj':
-                    if iden not in self.dmoj_user_suggests.keys():
-                        self.dmoj_user_suggests[iden] = DMOJUserSuggester(user_data[iden]['dmoj'])
-                        await self.dmoj_user_suggests[iden].update_pp_range()
-                    points, maximum = self.dmoj_user_suggests[iden].get_pp_range()
-                elif oj == 'codeforces':
-                    if iden not in self.cf_user_suggests.keys():
-                        self.cf_user_suggests[iden] = CodeforcesUserSuggester(user_data[iden]['codeforces'])
-                        await self.cf_user_suggests[iden].update_pp_range()
-                    points, maximum = self.cf_user_suggests[iden].get_pp_range()
+                suggester = await self.get_suggester(oj, user_data[iden][oj])
+                points, maximum = suggester.get_pp_range()
 
             if not user_data[iden]['can_repeat']:
                 if oj == 'dmoj' and user_data[iden]['dmoj'] is not None:
-                    user_response = await webc.webget_json('https://dmoj.ca/api/user/info/%s' % user_data[iden]['dmoj'])
-                    if points is None:
-                        for name, prob in list(self.dmoj_problems.items()):
-                            if name not in user_response['solved_problems']:
-                                temp_dmoj_problems[name] = prob
-                    else:
-                        temp_dmoj_problems['dmoj'] = {}
-                        for point in list(self.problems_by_points['dmoj']):
-                            temp_dmoj_problems['dmoj'][point] = {}
-                            for name, prob in list(self.problems_by_points['dmoj'][point].items()):
-                                if name not in user_response['solved_problems']:
-                                    temp_dmoj_problems['dmoj'][point][name] = prob
-                    if temp_dmoj_problems == {}:
-                        raise InvalidParametersException()
+                    solved = await solved_store.dmoj_solved(user_data[iden]['dmoj'])
                 elif oj == 'codeforces' and user_data[iden]['codeforces'] is not None:
-                    response = await webc.webget_json('https://codeforces.com/api/user.status?handle=' + user_data[iden]['codeforces'])
-                    if response['status'] != 'OK':
+                    solved = await solved_store.cf_solved(user_data[iden]['codeforces'])
+                    if solved is None:
                         return None
-                    solved = []
-                    for sub in response['result']:
-                        if sub['verdict'] == 'OK':
-                            if 'contestId' in sub['problem']:
-                                solved.append((sub['problem']['contestId'], sub['problem']['index']))
-                            elif 'problemsetName' in sub['problem']:
-                                solved.append((sub['problem']['problemsetName'], sub['problem']['index']))
-                    if points is None:
-                        temp_cf_problems = list(filter(lambda prob: (prob.get('contestId', prob.get('problemsetName')), prob['index']) not in solved, self.cf_problems))
-                    else:
-                        temp_cf_problems = {'codeforces': {}}
-                        for point in list(self.problems_by_points['codeforces']):
-                            temp_cf_problems['codeforces'][point] = list(filter(lambda prob: (prob['contestId'], prob['index']) not in solved, self.problems_by_points['codeforces'][point]))
-                    if temp_cf_problems == [] or (type(temp_cf_problems) is dict and temp_cf_problems['codeforces'] == {}):
-                        raise InvalidParametersException()
-
-        if temp_dmoj_problems != {}:
-            problem_list = temp_dmoj_problems
-        elif temp_cf_problems != []:
-            problem_list = temp_cf_problems
-        elif points is None:
-            if oj == 'dmoj':
-                problem_list = self.dmoj_problems
-            elif oj == 'codeforces':
-                problem_list = self.cf_problems
-        else:
-            problem_list = self.problems_by_points
 
         if points is not None:
             if not points.isdigit():
@@ -430,120 +414,72 @@ class ProblemCog(commands.Cog):
                 raise InvalidQueryException()
             maximum = int(maximum)
 
-            if oj != 'leetcode':
-                possibilities = []
-                for point in list(problem_list[oj].keys()):
-                    if point >= points and point <= maximum:
-                        possibilities.append(point)
-                if len(possibilities) == 0:
-                    if suggestions_on and oj == 'dmoj':
-                        while len(possibilities) == 0:
-                            self.dmoj_user_suggests[iden].expand_pp_range()
-                            points, maximum = map(int, self.dmoj_user_suggests[iden].get_pp_range())
-                            for point in list(problem_list[oj].keys()):
-                                if point >= points and point <= maximum:
-                                    possibilities.append(point)
-                            if points <= 1 and maximum >= 50 and len(possibilities) == 0:
-                                raise InvalidParametersException()
-                    elif suggestions_on and oj == 'codeforces':
-                        while len(possibilities) == 0:
-                            self.cf_user_suggests[iden].expand_pp_range()
-                            points, maximum = map(int, self.cf_user_suggests[iden].get_pp_range())
-                            for point in list(problem_list[oj].keys()):
-                                if point >= points and point <= maximum:
-                                    possibilities.append(point)
-                            if points <= 1 and maximum >= 50 and len(possibilities) == 0:
-                                raise InvalidParametersException()
-                    else:
-                        raise InvalidParametersException()
-                points = rand.choice(possibilities)
-
-        if oj == 'dmoj':
-            if not self.dmoj_problems:
-                raise OnlineJudgeHTTPException('DMOJ')
-
-            if points is None:
-                name, prob = rand.choice(list(problem_list.items()))
-            elif points in problem_list['dmoj'] and len(problem_list['dmoj'][points]) > 0:
-                name, prob = rand.choice(list(problem_list['dmoj'][points].items()))
-            else:
+        if oj == 'leetcode':
+            if len(tags) > 0:
                 raise InvalidParametersException()
-            if iden is not None:
-                user_data[iden]['last_dmoj_problem'] = name
-                query.update_user(iden, 'last_dmoj_problem', name)
-            return self.embed_dmoj_problem(name, prob, suggestions_on)
-
-        elif oj == 'codeforces':
-            if not self.cf_problems:
-                raise OnlineJudgeHTTPException('Codeforces')
-                return
-            if points is None:
-                prob = rand.choice(problem_list)
-            elif points in problem_list['codeforces']:
-                prob = rand.choice(problem_list['codeforces'][points])
-            else:
-                raise InvalidParametersException()
-            return self.embed_cf_problem(prob, suggestions_on)
-
-        elif oj == 'atcoder':
-            if not self.atcoder_problems:
-                raise OnlineJudgeHTTPException('AtCoder')
-
-            if points is None:
-                prob = rand.choice(self.atcoder_problems)
-            elif points in self.problems_by_points['atcoder']:
-                prob = rand.choice(self.problems_by_points['atcoder'][points])
-            else:
-                raise InvalidParametersException()
-            return self.embed_atcoder_problem(prob)
-
-        elif oj == 'cses':
-            prob = rand.choice(self.cses_problems)
-            return self.embed_cses_problem(prob)
-
-        elif oj == 'szkopul':
-            prob = rand.choice(list(self.szkopul_problems.values()))
-            return self.embed_szkopul_problem(prob)
-
-        elif oj == 'leetcode':
             if points is not None:
                 if points not in (1, 2, 3):
                     raise InvalidParametersException(leetcode=True)
-                if maximum is not None:
-                    if maximum not in (1, 2, 3) or maximum < points:
-                        raise InvalidParametersException(leetcode=True)
-                    else:
-                        points = rand.randint(points, maximum)
-                def is_level(prob):
-                    return prob['level'] == points
-                if paid:
-                    prob = rand.choice(list(filter(is_level, self.leetcode_problems + self.leetcode_problems_paid)))
-                else:
-                    prob = rand.choice(list(filter(is_level, self.leetcode_problems)))
-            elif paid:
-                    prob = rand.choice(self.leetcode_problems + self.leetcode_problems_paid)
-            else:
-                prob = rand.choice(self.leetcode_problems)
-            return self.embed_leetcode_problem(prob)
-
+                if maximum is None:
+                    maximum = points
+                elif maximum not in (1, 2, 3) or maximum < points:
+                    raise InvalidParametersException(leetcode=True)
+            candidates = [prob for prob in catalog if (paid or not prob.paid) and (points is None or points <= prob.points <= maximum)]
+            if len(candidates) == 0:
+                raise IndexError('%s catalog is empty' % oj)
+            return self.embed_problem_set(rand.sample(candidates, min(count, len(candidates))))
+
+        excluded = solved.mask(catalog) if solved else 0
+        included = catalog.tags_mask(tags)
+        if points is None:
+            ids = catalog.sample_many(0, len(catalog), count, excluded, included, spread)
         else:
-            raise NoSuchOJException(oj)
-
-    def check_existing_user(self, user):
-        query.insert_ignore_user(user.id)
-
-    def check_existing_server(self, server):
-        query.insert_ignore_server(server.id)
+            ids = catalog.sample_many(*catalog.span(points, points if maximum is None else maximum), count, excluded, included, spread)
+            if len(ids) == 0 and suggester is not None:
+                for points, maximum in suggester.expanded_pp_ranges():
+                    ids = catalog.sample_many(*catalog.span(points, maximum), count, excluded, included, spread)
+                    if len(ids) > 0:
+                        break
+        if len(ids) == 0:
+            if len(catalog) == 0:
+                raise IndexError('%s catalog is empty' % oj)
+            raise InvalidParametersException()
+        problems = [catalog[id] for id in ids]
+
+        if oj == 'dmoj' and iden is not None:
+            user_data[iden]['last_dmoj_problem'] = problems[0].key
+            await query.update_user(iden, 'last_dmoj_problem', problems[0].key)
+        return self.embed_problem_set(problems, suggestions_on)
+
+    async def check_existing_user(self, user):
+        await query.insert_ignore_user(user.id)
+
+    async def check_existing_server(self, server):
+        await query.insert_ignore_server(server.id)
 
     @commands.command(aliases=['r'])
     @commands.bot_has_permissions(embed_links=True)
-    async def random(self, ctx, oj=None, points=None, maximum=None):
-        self.check_existing_user(ctx.message.author)
+    async def random(self, ctx, oj=None, *args):
+        await self.check_existing_user(ctx.message.author)
+        tags = []
+        bounds = []
+        count = 1
+        spread = False
+        for arg in args:
+            if re.match(r'^[xX]\d+$', arg):
+                count = max(1, min(int(arg[1:]), self.max_problem_set))
+            elif arg.lower() == 'spread':
+                spread = True
+            elif any(char.isalpha() for char in arg):
+                tags += [tag for tag in arg.split(',') if tag.strip() != '']
+            else:
+                bounds.append(arg)
+        points, maximum = (bounds + [None, None])[:2]
         if isinstance(oj, str) and (oj.lower() == 'peg' or oj.lower() == 'wcipeg'):
             await ctx.send(ctx.message.author.display_name + ', Notice: Support for WCIPEG has been discontinued as **PEG Judge shut down at the end of July 2020**\nhttps://wcipeg.com/announcement/9383')
             return
         try:
-            title, description, embed = await self.get_random_problem(oj, points, maximum, ctx.message.author.id)
+            title, description, embed = await self.get_random_problem(oj, points, maximum, ctx.message.author.id, tags=tags, count=count, spread=spread)
             embed.title = title
             embed.description = description + ' (searched in %ss)' % str(round(self.bot.latency, 3))
             embed.timestamp = datetime.utcnow()
@@ -558,15 +494,43 @@ class ProblemCog(commands.Cog):
             await ctx.send(ctx.message.author.display_name + ', There seems to be a problem with %s. Please try again later :shrug:' % str(e))
         except InvalidQueryException:
             await ctx.send(ctx.message.author.display_name + ', Invalid query. Make sure your points are positive integers.')
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            await ctx.send(ctx.message.author.display_name + ', There seems to be a problem reaching that online judge. Please try again later :shrug:')
+
+    def search_problems(self, name, limit=5):
+        results = []
+        for oj, catalog in self.catalogs.items():
+            for score, id in catalog.title_index.search(name, limit):
+                results.append((score, oj, id))
+        return [self.catalogs[oj][id] for score, oj, id in heapq.nlargest(limit, results)]
+
+    @commands.command(aliases=['find'])
+    @commands.bot_has_permissions(embed_links=True)
+    async def search(self, ctx, *, name=None):
+        if name is None:
+            prefix = await self.bot.command_prefix(self.bot, ctx.message)
+            await ctx.send(ctx.message.author.display_name + ', Invalid query. Please use format `%ssearch <problem name>`.' % prefix)
+            return
+        problems = self.search_problems(name)
+        if len(problems) == 0:
+            await ctx.send(ctx.message.author.display_name + ', Sorry, I couldn\'t find any problems named "%s"' % name)
+            return
+        title, description, embed = self.embed_problem(problems[0])
+        embed.title = title
+        embed.description = description + ' (searched in %ss)' % str(round(self.bot.latency, 3))
+        embed.timestamp = datetime.utcnow()
+        if len(problems) > 1:
+            embed.add_field(name='Other matches', value='\n'.join('[%s] [%s](%s)' % (self.onlineJudges.formal_names[prob.judge], prob.name, prob.url) for prob in problems[1:]), inline=False)
+        await ctx.send(ctx.message.author.display_name + ', Here\'s what I found!', embed=embed)
 
     @commands.command(aliases=['toggleRepeat', 'tr'])
     async def togglerepeat(self, ctx):
-        self.check_existing_user(ctx.message.author)
-        user_data = query.get_user(ctx.message.author.id)
+        await self.check_existing_user(ctx.message.author)
+        user_data = await query.get_user(ctx.message.author.id)
         for account in self.onlineJudges.accounts:
             if user_data[ctx.message.author.id][account] is not None:
                 user_data[ctx.message.author.id]['can_repeat'] = not user_data[ctx.message.author.id]['can_repeat']
-                query.update_user(ctx.message.author.id, 'can_repeat', user_data[ctx.message.author.id]['can_repeat'])
+                await query.update_user(ctx.message.author.id, 'can_repeat', user_data[ctx.message.author.id]['can_repeat'])
                 prefix = await self.bot.command_prefix(self.bot, ctx.message)
                 if user_data[ctx.message.author.id]['can_repeat']:
                     await ctx.send(ctx.message.author.display_name + ', random problems will now contain already solved problems')
@@ -577,12 +541,12 @@ class ProblemCog(commands.Cog):
 
     @commands.command(aliases=['toggleSuggest', 'ts'])
     async def togglesuggest(self, ctx):
-        self.check_existing_user(ctx.message.author)
-        user_data = query.get_user(ctx.message.author.id)
+        await self.check_existing_user(ctx.message.author)
+        user_data = await query.get_user(ctx.message.author.id)
         for account in self.onlineJudges.accounts:
             if user_data[ctx.message.author.id][account] is not None:
                 user_data[ctx.message.author.id]['can_suggest'] = not user_data[ctx.message.author.id]['can_suggest']
-                query.update_user(ctx.message.author.id, 'can_suggest', user_data[ctx.message.author.id]['can_suggest'])
+                await query.update_user(ctx.message.author.id, 'can_suggest', user_data[ctx.message.author.id]['can_suggest'])
                 prefix = await self.bot.command_prefix(self.bot, ctx.message)
                 if user_data[ctx.message.author.id]['can_suggest']:
                     await ctx.send(ctx.message.author.display_name + ', random problems will now be suggested based on your existing solves')
@@ -595,11 +559,11 @@ class ProblemCog(commands.Cog):
     async def setcountry(self, ctx, code=''):
         try:
             country_object = Country(code)
-            self.check_existing_user(ctx.message.author)
-            user_data = query.get_user(ctx.message.author.id)
+            await self.check_existing_user(ctx.message.author)
+            user_data = await query.get_user(ctx.message.author.id)
             prev_country = user_data[ctx.message.author.id]['country']
             user_data[ctx.message.author.id]['country'] = country_object.country
-            query.update_user(ctx.message.author.id, 'country', user_data[ctx.message.author.id]['country'])
+            await query.update_user(ctx.message.author.id, 'country', user_data[ctx.message.author.id]['country'])
             if prev_country is not None and prev_country != country_object.country:
                 await ctx.send(ctx.message.author.display_name + ', Changed your country from %s to %s.' % (str(Country(prev_country)), str(country_object)))
             else:
@@ -614,8 +578,8 @@ class ProblemCog(commands.Cog):
         if user is None:
             user = ctx.message.author
 
-        self.check_existing_user(user)
-        user_data = query.get_user(user.id)
+        await self.check_existing_user(user)
+        user_data = await query.get_user(user.id)
 
         embed = discord.Embed(title=user.display_name)
         embed.timestamp = datetime.utcnow()
@@ -644,8 +608,8 @@ class ProblemCog(commands.Cog):
             await ctx.send(ctx.message.author.display_name + ', You can only request for server info within a server!')
             return
 
-        query.insert_ignore_server(ctx.message.guild.id)
-        server_data = query.get_server(ctx.message.guild.id)
+        await query.insert_ignore_server(ctx.message.guild.id)
+        server_data = await query.get_server(ctx.message.guild.id)
 
         embed = discord.Embed(title=ctx.message.guild.name)
         embed.timestamp = datetime.utcnow()
@@ -661,7 +625,7 @@ class ProblemCog(commands.Cog):
         embed.add_field(name='Server prefix', value=prefix, inline=False)
         clist = ''
         for text_channel in ctx.message.guild.text_channels:
-            if query.exists('subscriptions_contests', 'channel_id', text_channel.id):
+            if await query.exists('subscriptions_contests', 'channel_id', text_channel.id):
                 clist += text_channel.mention + '\n'
         embed.add_field(name='Contest notification channel(s)', value='None' if clist == '' else clist, inline=False)
         await ctx.send(ctx.message.author.display_name + ', Here is your requested info!', embed=embed)
@@ -678,10 +642,9 @@ class ProblemCog(commands.Cog):
             return
         try:
             if source is None and len(ctx.message.attachments) > 0:
-                f = webc.webget_text(ctx.message.attachments[0].url)
-                source = f.content
-            self.check_existing_user(ctx.message.author)
-            user_data = query.get_user(ctx.message.author.id)
+                source = await webc.webget_text(ctx.message.attachments[0].url)
+            await self.check_existing_user(ctx.message.author)
+            user_data = await query.get_user(ctx.message.author.id)
             if problem == '^' and user_data[ctx.message.author.id]['last_dmoj_problem'] is not None:
                 problem = user_data[ctx.message.author.id]['last_dmoj_problem']
             id = await user_session.submit(problem, self.language.getId(lang), source)
@@ -698,10 +661,9 @@ class ProblemCog(commands.Cog):
         if str(after.status) == 'offline' and str(before.status) != 'offline' and after.id in self.dmoj_sessions.keys():
             await after.send('Attention! You have been logged out of the account %s due to being offline (Note that your account will still be linked to your Discord account, but will now be unable to submit to problems)' % self.dmoj_sessions.pop(after.id))
 
-    @tasks.loop(hours=23)
+    @tasks.loop(hours=2)
     async def refresh_dmoj_problems(self):
-        await self.parse_dmoj_problems()
-        self.fetch_times['dmoj'] = time()
+        await self.refresh_problems('dmoj', self.parse_dmoj_problems)
 
     @refresh_dmoj_problems.before_loop
     async def refresh_dmoj_problems_before(self):
@@ -709,8 +671,7 @@ class ProblemCog(commands.Cog):
 
     @tasks.loop(hours=25)
     async def refresh_cf_problems(self):
-        self.parse_cf_problems()
-        self.fetch_times['codeforces'] = time()
+        await self.refresh_problems('codeforces', self.parse_cf_problems)
 
     @refresh_cf_problems.before_loop
     async def refresh_cf_problems_before(self):
@@ -718,8 +679,7 @@ class ProblemCog(commands.Cog):
 
     @tasks.loop(hours=26)
     async def refresh_atcoder_problems(self):
-        self.parse_atcoder_problems()
-        self.fetch_times['atcoder'] = time()
+        await self.refresh_problems('atcoder', self.parse_atcoder_problems)
 
     @refresh_atcoder_problems.before_loop
     async def refresh_atcoder_problems_before(self):
@@ -727,17 +687,15 @@ class ProblemCog(commands.Cog):
 
     @tasks.loop(hours=24*7)
     async def refresh_cses_problems(self):
-        self.parse_cses_problems()
-        self.fetch_times['cses'] = time()
+        await self.refresh_problems('cses', self.parse_cses_problems)
 
     @refresh_cses_problems.before_loop
     async def refresh_cses_problems_before(self):
         await self.bot.wait_until_ready()
 
-    @tasks.loop(hours=1, minutes=27)
+    @tasks.loop(hours=6)
     async def refresh_szkopul_problems(self):
-        self.parse_szkopul_problems()
-        self.fetch_times['szkopul'] = time()
+        await self.refresh_problems('szkopul', self.parse_szkopul_problems)
 
     @refresh_szkopul_problems.before_loop
     async def refresh_szkopul_problems_before(self):
@@ -745,8 +703,7 @@ class ProblemCog(commands.Cog):
 
     @tasks.loop(hours=28)
     async def refresh_leetcode_problems(self):
-        self.parse_leetcode_problems()
-        self.fetch_times['leetcode'] = time()
+        await self.refresh_problems('leetcode', self.parse_leetcode_problems)
 
     @refresh_leetcode_problems.before_loop
     async def refresh_leetcode_problems_before(self):
@@ -756,8 +713,8 @@ class ProblemCog(commands.Cog):
     @commands.guild_only()
     async def tea(self, ctx, user: discord.User=None):
         if user is None:
-            self.check_existing_user(ctx.message.author)
-            user_data = query.get_user(ctx.message.author.id)
+            await self.check_existing_user(ctx.message.author)
+            user_data = await query.get_user(ctx.message.author.id)
             if user_data[ctx.message.author.id]['tea'] == 1:
                 await ctx.send(ctx.message.author.display_name + ', You have 1 cup of :tea:.')
             else:
@@ -769,9 +726,9 @@ class ProblemCog(commands.Cog):
         elif user.id == self.bot.user.id:
             await ctx.send(ctx.message.author.display_name + ', Thanks for the :tea:!')
             return
-        self.check_existing_user(user)
-        user_data = query.get_user(user.id)
-        query.update_user(user.id, 'tea', user_data[user.id]['tea']+1)
+        await self.check_existing_user(user)
+        user_data = await query.get_user(user.id)
+        await query.update_user(user.id, 'tea', user_data[user.id]['tea']+1)
         await ctx.send(ctx.message.author.display_name + ', sent a cup of :tea: to ' + user.mention)
 
 def setup(bot):
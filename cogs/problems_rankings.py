@@ -1,11 +1,13 @@
+import traceback
 from time import time
 from cogs.problems import *
 
 
 class ProblemRankingCog(ProblemCog):
 
-    update_dmoj_index = 0
-    update_cf_index = 0
+    update_dmoj_cursor = 0
+    update_cf_cursor = 0
+    rank_batch_size = 5
     dmoj_ratings = {
         range(3000, 4000): ('Target', discord.Colour(int('ee0000', 16))),
         range(2200, 2999): ('Grandmaster', discord.Colour(int('ee0000', 16))),
@@ -34,11 +36,11 @@ class ProblemRankingCog(ProblemCog):
     def __init__(self, bot):
         ProblemCog.__init__(self, bot)
 
-        self.dmoj_server_roles = query.get_all_role_sync('dmoj')
-        self.cf_server_roles = query.get_all_role_sync('codeforces')
+        self.dmoj_server_roles = query.sync.get_all_role_sync('dmoj')
+        self.cf_server_roles = query.sync.get_all_role_sync('codeforces')
 
-        self.dmoj_server_nicks = query.get_all_nick_sync('dmoj')
-        self.cf_server_nicks = query.get_all_nick_sync('codeforces')
+        self.dmoj_server_nicks = query.sync.get_all_nick_sync('dmoj')
+        self.cf_server_nicks = query.sync.get_all_nick_sync('codeforces')
 
         self.update_dmoj_ranks.start()
         self.update_cf_ranks.start()
@@ -59,13 +61,13 @@ class ProblemRankingCog(ProblemCog):
                 prefix = await self.bot.command_prefix(self.bot, ctx.message)
                 await ctx.send('Invalid query. Please use format `%sconnect dmoj <dmoj-api-token>` (your DMOJ API token can be found by going to https://dmoj.ca/edit/profile/ and selecting the __Generate__ or __Regenerate__ option next to API Token).' % prefix)
             else:
-                self.check_existing_user(ctx.message.author)
-                user_data = query.get_user(ctx.message.author.id)
+                await self.check_existing_user(ctx.message.author)
+                user_data = await query.get_user(ctx.message.author.id)
                 try:
                     self.dmoj_sessions[ctx.message.author.id] = DMOJSession(token, ctx.message.author)
                     await self.dmoj_sessions[ctx.message.author.id].generate()
                     user_data[ctx.message.author.id]['dmoj'] = str(self.dmoj_sessions[ctx.message.author.id])
-                    query.update_user(ctx.message.author.id, 'dmoj', user_data[ctx.message.author.id]['dmoj'])
+                    await query.update_user(ctx.message.author.id, 'dmoj', user_data[ctx.message.author.id]['dmoj'])
                     for guild in self.bot.guilds:
                         if guild.id in self.dmoj_server_nicks:
                             for member in guild.members:
@@ -81,15 +83,15 @@ class ProblemRankingCog(ProblemCog):
                     await ctx.send('Due to security reasons, we now must ask you to place the following token in your self-description (you can edit your self-description here https://dmoj.ca/edit/profile/)\nThis is just an extra precaution to confirm your identity.\n```%s```Once this is done, run the command that you just ran again to connect to your DMOJ account!' % e.hash)
 
         elif site.lower() == 'cf' or site.lower() == 'codeforces':             
-            self.check_existing_user(ctx.message.author)
-            user_data = query.get_user(ctx.message.author.id)
+            await self.check_existing_user(ctx.message.author)
+            user_data = await query.get_user(ctx.message.author.id)
             if token is None or (ctx.message.author.id in self.cf_sessions.keys() and self.cf_sessions[ctx.message.author.id].handle is not None and token.lower() == str(self.cf_sessions[ctx.message.author.id]).lower()):
                 try:
                     if ctx.message.author.id in self.cf_sessions:
                         validated = await self.cf_sessions[ctx.message.author.id].validate()
                         if not validated:
                             raise NoSubmissionsException
-                        query.update_user(ctx.message.author.id, 'codeforces', str(self.cf_sessions[ctx.message.author.id]))
+                        await query.update_user(ctx.message.author.id, 'codeforces', str(self.cf_sessions[ctx.message.author.id]))
                         user_data[ctx.message.author.id]['codeforces'] = str(self.cf_sessions[ctx.message.author.id])
                         for guild in self.bot.guilds:
                             if guild.id in self.cf_server_nicks:
@@ -108,7 +110,7 @@ class ProblemRankingCog(ProblemCog):
                                 if country is None:
                                     return
                                 user_data[ctx.message.author.id]['country'] = country
-                                query.update_user(ctx.message.author.id, 'country', country)
+                                await query.update_user(ctx.message.author.id, 'country', country)
                                 await ctx.send('Country detected as %s; set as your country.' % str(Country(country)))
                     else:
                         prefix = await self.bot.command_prefix(self.bot, ctx.message)
@@ -151,8 +153,8 @@ class ProblemRankingCog(ProblemCog):
             prefix = await self.bot.command_prefix(self.bot, ctx.message)
             await ctx.send(mention + 'Invalid query. Please use format `%sdisconnect <site>`.' % prefix)
         elif site.lower() == 'dmoj':
-            self.check_existing_user(ctx.message.author)
-            user_data = query.get_user(ctx.message.author.id)
+            await self.check_existing_user(ctx.message.author)
+            user_data = await query.get_user(ctx.message.author.id)
             if user_data[ctx.message.author.id]['dmoj'] is None:
                 await ctx.send(mention + 'Your DMOJ account is already not connected!')
                 return
@@ -160,17 +162,17 @@ class ProblemRankingCog(ProblemCog):
                 self.dmoj_sessions.pop(ctx.message.author.id)
             handle = user_data[ctx.message.author.id]['dmoj']
             user_data[ctx.message.author.id]['dmoj'] = None
-            query.update_user(ctx.message.author.id, 'dmoj', None)
+            await query.update_user(ctx.message.author.id, 'dmoj', None)
             await ctx.send(mention + 'Successfully disconnected your DMOJ account: %s' % handle)
         elif site.lower() == 'cf' or site.lower() == 'codeforces':
-            self.check_existing_user(ctx.message.author)
-            user_data = query.get_user(ctx.message.author.id)
+            await self.check_existing_user(ctx.message.author)
+            user_data = await query.get_user(ctx.message.author.id)
             if user_data[ctx.message.author.id]['codeforces'] is None:
                 await ctx.send(mention + 'Your Codeforces account is already not connected!')
                 return
             handle = user_data[ctx.message.author.id]['codeforces']
             user_data[ctx.message.author.id]['codeforces'] = None
-            query.update_user(ctx.message.author.id, 'codeforces', None)
+            await query.update_user(ctx.message.author.id, 'codeforces', None)
             await ctx.send(mention + 'Successfully disconnected your Codeforces account: %s' % handle)          
         else:
             await ctx.send(mention + 'Sorry, that site does not exist or logins to that site are not available yet')
@@ -179,7 +181,7 @@ class ProblemRankingCog(ProblemCog):
     @commands.has_permissions(manage_roles=True, manage_nicknames=True)
     @commands.guild_only()
     async def setsync(self, ctx, site=None, option=''):
-        self.check_existing_server(ctx.message.guild)
+        await self.check_existing_server(ctx.message.guild)
         if site is None:
             prefix = await self.bot.command_prefix(self.bot, ctx.message)
             await ctx.send(ctx.message.author.display_name + ', Invalid query. Please use format `%ssetsync <sync source>` (available sync sources are DMOJ and Codeforces, or OFF to turn automatic roles off.' % prefix)
@@ -212,32 +214,32 @@ class ProblemRankingCog(ProblemCog):
                             self.cf_server_roles.remove(ctx.message.guild.id)
                         self.dmoj_server_roles.append(ctx.message.guild.id)
                     
-                        query.update_server(ctx.message.guild.id, 'role_sync', True)
+                        await query.update_server(ctx.message.guild.id, 'role_sync', True)
                         await ctx.send(ctx.message.author.display_name + ', DMOJ based ranked roles set to `ON`. It may take some time for all roles to fully update.')
                 
                 else:
-                    query.update_server(ctx.message.guild.id, 'role_sync', False)
+                    await query.update_server(ctx.message.guild.id, 'role_sync', False)
 
                 if option not in role_options: 
                     if ctx.message.guild.id in self.dmoj_server_nicks:
                         await ctx.send(ctx.message.author.display_name + ', DMOJ based nicknames already set to `ON`!')
                     else:
                         forbidden_users = 0
+                        handles = await query.get_linked_handles('dmoj', [member.id for member in ctx.message.guild.members])
                         for member in ctx.message.guild.members:
-                            user_data = query.get_user(member.id)
-                            if member.id in user_data.keys() and user_data[member.id]['dmoj'] is not None:
+                            if member.id in handles:
                                 try:
-                                    await member.edit(nick=user_data[member.id]['dmoj'])
+                                    await member.edit(nick=handles[member.id])
                                 except discord.errors.Forbidden:
                                     forbidden_users += 1
                         self.dmoj_server_nicks.append(ctx.message.guild.id)
-                        query.update_server(ctx.message.guild.id, 'nickname_sync', True)
+                        await query.update_server(ctx.message.guild.id, 'nickname_sync', True)
                         await ctx.send(ctx.message.author.display_name + ', DMOJ based nicknames set to `ON`. Skipped changing the nickname of %d members due to having lower permissions.' % forbidden_users)
                 
                 else:
-                    query.update_server(ctx.message.guild.id, 'nickname_sync', False)
+                    await query.update_server(ctx.message.guild.id, 'nickname_sync', False)
 
-                query.update_server(ctx.message.guild.id, 'sync_source', 'dmoj')
+                await query.update_server(ctx.message.guild.id, 'sync_source', 'dmoj')
 
             except discord.errors.Forbidden:
                 await ctx.send(ctx.message.author.display_name + ', Set sync failed, make sure that the bot has the Manage Roles and Manage Roles permissions and try again.')
@@ -261,12 +263,12 @@ class ProblemRankingCog(ProblemCog):
                         if ctx.message.guild.id in self.dmoj_server_roles:
                             self.dmoj_server_roles.remove(ctx.message.guild.id)
                         self.cf_server_roles.append(ctx.message.guild.id)
-                        query.update_server(ctx.message.guild.id, 'role_sync', True)
+                        await query.update_server(ctx.message.guild.id, 'role_sync', True)
                         await ctx.send(ctx.message.author.display_name + ', Codeforces based ranked roles set to `ON`. It may take some time for all roles to fully update.')
                        
                                     
                 else:
-                    query.update_server(ctx.message.guild.id, 'role_sync', False)
+                    await query.update_server(ctx.message.guild.id, 'role_sync', False)
                   
                 if option not in role_options:  
                     if ctx.message.guild.id in self.cf_server_nicks:
@@ -274,20 +276,20 @@ class ProblemRankingCog(ProblemCog):
                     else:            
                         self.cf_server_nicks.append(ctx.message.guild.id)
                         forbidden_users = []
+                        handles = await query.get_linked_handles('codeforces', [member.id for member in ctx.message.guild.members])
                         for member in ctx.message.guild.members:
-                            user_data = query.get_user(member.id)
-                            if member.id in user_data.keys() and user_data[member.id]['codeforces'] is not None:
+                            if member.id in handles:
                                 try:
-                                    await member.edit(nick=user_data[member.id]['codeforces'])
+                                    await member.edit(nick=handles[member.id])
                                 except discord.errors.Forbidden:
                                     forbidden_users.append('%s#%s' % (member.name, member.discriminator))
-                        query.update_server(ctx.message.guild.id, 'nickname_sync', True)
+                        await query.update_server(ctx.message.guild.id, 'nickname_sync', True)
                         await ctx.send(ctx.message.author.display_name + ', Codeforces based nicknames set to `ON`. Skipped changing the nickname of %d members due to having lower permissions.' % len(forbidden_users))
                        
                 else:
-                    query.update_server(ctx.message.guild.id, 'nickname_sync', False)
+                    await query.update_server(ctx.message.guild.id, 'nickname_sync', False)
 
-                query.update_server(ctx.message.guild.id, 'sync_source', 'codeforces')
+                await query.update_server(ctx.message.guild.id, 'sync_source', 'codeforces')
 
             except discord.errors.Forbidden:
                 await ctx.send(ctx.message.author.display_name + ', Set sync failed, make sure that the bot has the Manage Roles and Manage Roles permissions and try again.')
@@ -305,7 +307,7 @@ class ProblemRankingCog(ProblemCog):
                             self.dmoj_server_roles.remove(ctx.message.guild.id)
                         if ctx.message.guild.id in self.cf_server_roles:
                             self.cf_server_roles.remove(ctx.message.guild.id)
-                        query.update_server(ctx.message.guild.id, 'role_sync', False)
+                        await query.update_server(ctx.message.guild.id, 'role_sync', False)
                         await ctx.send(ctx.message.author.display_name + ', Ranked roles set to `OFF`')
                 
                 if option not in role_options:
@@ -316,18 +318,14 @@ class ProblemRankingCog(ProblemCog):
                             self.dmoj_server_nicks.remove(ctx.message.guild.id)
                         if ctx.message.guild.id in self.cf_server_nicks:
                             self.cf_server_nicks.remove(ctx.message.guild.id)
-                        query.update_server(ctx.message.guild.id, 'nickname_sync', False)
+                        await query.update_server(ctx.message.guild.id, 'nickname_sync', False)
                         await ctx.send(ctx.message.author.display_name + ', Nickname sync set to `OFF`')
 
             except discord.errors.Forbidden:
                 await ctx.send(ctx.message.author.display_name + ', Set sync failed, make sure that the bot has the Manage Roles and Manage Roles permissions and try again.')
 
-    @tasks.loop(minutes=1)
-    async def update_dmoj_ranks(self):
-        self.update_dmoj_index, user_data = query.get_next_user_by_row(self.update_dmoj_index, 'dmoj')
-        if user_data == {}:
-            return
-        user_info = await webc.webget_json('https://dmoj.ca/api/user/info/%s' % user_data['dmoj'])
+    async def update_dmoj_rank(self, user_data):
+        user_info = await webc.webget_json('https://dmoj.ca/api/user/info/%s' % user_data['dmoj'], background=True)
         current_rating = user_info['contests']['current_rating']
         for rating, role in list(self.dmoj_ratings.items()):
             if current_rating in rating:
@@ -354,18 +352,35 @@ class ProblemRankingCog(ProblemCog):
             except:
                 pass
 
+    @tasks.loop(minutes=1)
+    async def update_dmoj_ranks(self):
+        batch = await query.get_linked_users_after('dmoj', self.update_dmoj_cursor, self.rank_batch_size)
+        for user_data in batch:
+            try:
+                await self.update_dmoj_rank(user_data)
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                # the loop retries connection errors, starting again from this user
+                raise
+            except Exception:
+                print('Failed to update DMOJ rank of %s (%d)' % (user_data['dmoj'], user_data['user_id']))
+                traceback.print_exc()
+            self.update_dmoj_cursor = user_data['user_id']
+        if len(batch) < self.rank_batch_size:
+            self.update_dmoj_cursor = 0
+
     @update_dmoj_ranks.before_loop
     async def update_dmoj_ranks_before(self):
         await self.bot.wait_until_ready()
 
-    @tasks.loop(minutes=1)
-    async def update_cf_ranks(self):
-        self.update_cf_index, user_data = query.get_next_user_by_row(self.update_cf_index, 'codeforces')
-        if user_data == {}:
-            return
-        user_info = (await webc.webget_json('https://codeforces.com/api/user.info?handles=%s' % user_data['codeforces']))['result'][0]
+    async def get_cf_user_info(self, handles):
+        response = await webc.webget_json('https://codeforces.com/api/user.info?handles=%s' % ';'.join(handles), background=True)
+        if response['status'] != 'OK':
+            return None
+        return response['result']
+
+    async def update_cf_rank(self, user_data, user_info):
         for guild in self.bot.guilds:
-            self.check_existing_server(guild)
+            await self.check_existing_server(guild)
             if int(guild.id) not in self.cf_server_roles:
                 continue
             names = []
@@ -388,6 +403,31 @@ class ProblemRankingCog(ProblemCog):
             except:
                 pass
 
+    @tasks.loop(minutes=1)
+    async def update_cf_ranks(self):
+        batch = await query.get_linked_users_after('codeforces', self.update_cf_cursor, self.rank_batch_size)
+        user_infos = await self.get_cf_user_info([user_data['codeforces'] for user_data in batch]) if len(batch) > 0 else []
+        if user_infos is None:
+            # Codeforces fails the whole request when one handle no longer exists, so look each one up alone
+            user_infos = []
+            for user_data in batch:
+                user_info = await self.get_cf_user_info([user_data['codeforces']])
+                user_infos.append(None if user_info is None else user_info[0])
+        for user_data, user_info in zip(batch, user_infos):
+            try:
+                if user_info is None:
+                    print('Failed to update Codeforces rank of %s (%d): handle not found' % (user_data['codeforces'], user_data['user_id']))
+                else:
+                    await self.update_cf_rank(user_data, user_info)
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                raise
+            except Exception:
+                print('Failed to update Codeforces rank of %s (%d)' % (user_data['codeforces'], user_data['user_id']))
+                traceback.print_exc()
+            self.update_cf_cursor = user_data['user_id']
+        if len(batch) < self.rank_batch_size:
+            self.update_cf_cursor = 0
+
     @update_cf_ranks.before_loop
     async def update_cf_ranks_before(self):
         await self.bot.wait_until_ready()
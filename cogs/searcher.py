@@ -2,13 +2,13 @@ import discord
 from discord.ext import commands, tasks
 import random as rand
 import json
-import urllib
+import asyncio
 import wikipedia
 from time import time
 import yaml
 from datetime import datetime
-import bs4 as bs
-from bs4.element import Comment
+from utils import htmlparse
+from utils.htmlparse import parsec
 from utils.webclient import webc
 
 
@@ -28,45 +28,34 @@ class SearcherCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
 
-    def getSummary(self, name):
+    def wikipediaSummary(self, name):
+        return wikipedia.page(name), wikipedia.summary(name, sentences=5)
+
+    async def getSummary(self, name):
         try:
-            if urllib.request.urlopen('https://en.wikipedia.org/wiki/'+name).getcode() != 404:
-                return wikipedia.page(name), wikipedia.summary(name, sentences=5)
+            if await self.valid('https://en.wikipedia.org/wiki/'+name):
+                # the wikipedia package only has blocking calls
+                return await asyncio.get_event_loop().run_in_executor(None, self.wikipediaSummary, name)
         except wikipedia.DisambiguationError as e:
             if len(e.options) > 0:
-                return self.getSummary(e.options[0].replace(' ', '_'))
-            else:
-                return None, None
+                return await self.getSummary(e.options[0].replace(' ', '_'))
         except:
-            return None, None
+            pass
+        return None, None
 
-    def valid(self, url):
+    async def valid(self, url):
         try:
-            if urllib.request.urlopen(url).getcode() == 200:
-                return True
-            else:
-                return False
+            async with webc.request('GET', url) as resp:
+                return resp.status == 200
         except:
             return False
 
-    def tag_visible(self, element):
-        if element.parent.name in ['style', 'script', 'head', 'title', 'meta', '[document]']:
-            return False
-        if isinstance(element, Comment):
-            return False
-        return True
-
     async def wcipegScrape(self, name):
-        if self.valid('http://wcipeg.com/wiki/%s' % name.replace(' ', '_')):
+        if await self.valid('http://wcipeg.com/wiki/%s' % name.replace(' ', '_')):
             try:
                 url = 'http://wcipeg.com/wiki/%s' % name.replace(' ', '_')
                 wiki_response = await webc.webget_text(url)
-                soup = bs.BeautifulSoup(wiki_response, 'lxml')
-                scan = True
-                title = soup.find('h1', attrs={'id': 'firstHeading'}).contents[0]
-                texts = soup.find('div', attrs={'id': 'mw-content-text'}).find('p').find_all(text=True)
-                visible_texts = filter(self.tag_visible, texts)  
-                summary = ' '.join(t.strip() for t in visible_texts)
+                title, summary = await parsec.run(htmlparse.parse_wcipeg_summary, wiki_response)
                 return title, summary, url
             except:
                 return None
@@ -85,7 +74,7 @@ class SearcherCog(commands.Cog):
             embed.add_field(name='Summary', value=summary[-1024:], inline=False)
             await ctx.send(ctx.message.author.display_name + ', Here\'s what I found!', embed=embed)
             return
-        page, summary = self.getSummary(name.replace(' ', '_'))
+        page, summary = await self.getSummary(name.replace(' ', '_'))
         if summary is None:
             await ctx.send(ctx.message.author.display_name + ', Sorry, I couldn\'t find anything on "%s"' % name)
             return
@@ -1,6 +1,15 @@
 import yaml
+import queue
+import asyncio
 import pymysql
 import warnings
+import atexit
+import threading
+import traceback
+from time import monotonic
+from functools import partial
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 
 
 try:
@@ -10,101 +19,118 @@ except FileNotFoundError:
 finally:
     config = yaml.load(config_file, Loader=yaml.FullLoader)
     user, password, database = config['mysql']['user'], config['mysql']['pass'], config['mysql']['database']
+    pool_size = config['mysql'].get('pool_size', 5)
 
-db = pymysql.connect('localhost', user, password, database)
-
-# def make_db():
-#     """
-#     DANGER: RESETS ALL DATA IN DATABASE
-#     """
-#     cursor = db.cursor()
-#     cursor.execute("DROP TABLE IF EXISTS servers")
-#     cursor.execute("""CREATE TABLE servers (
-#         server_id BIGINT NOT NULL,
-#         nickname_sync BOOLEAN,
-#         role_sync BOOLEAN,
-#         sync_source VARCHAR(20),
-#         join_message BOOLEAN DEFAULT FALSE,
-#         prefix VARCHAR(255),
-#         PRIMARY KEY (server_id))""")
-#     cursor.execute("DROP TABLE IF EXISTS subscriptions_contests")
-#     cursor.execute("""CREATE TABLE subscriptions_contests (
-#         channel_id BIGINT NOT NULL,
-#         subint INT DEFAULT 63,
-#         PRIMARY KEY (channel_id))""")
-#     cursor.execute("DROP TABLE IF EXISTS users")
-#     cursor.execute("""CREATE TABLE users (
-#         user_id BIGINT NOT NULL,
-#         tea INT,
-#         dmoj VARCHAR(255),
-#         last_dmoj_problem VARCHAR(255),
-#         can_repeat BOOLEAN,
-#         codeforces VARCHAR(255),
-#         country VARCHAR(255),
-#         can_suggest BOOLEAN,
-#         PRIMARY KEY (user_id))""")
-#     cursor.execute("SHOW TABLES")
-#     result = cursor.fetchall()
-#     print("Tables:")
-#     for data in result:
-#         print(data[0])
+class ConnectionPool(object):
+    def __init__(self, size, **params):
+        self.params = params
+        self.idle = queue.LifoQueue()
+        self.slots = threading.BoundedSemaphore(size)
 
-class MySQLConnection(object):
-    def sanitize_id(self, id):
+    def discard(self, db):
         try:
-            return str(id).isdigit()
-        except TypeError:
-            return False
-        return True
-
-    def sanitize_alnum(self, *args):
-        try:
-            for value in args:
-                if not str(value).replace('_', '').isalnum():
-                    return False
-        except TypeError:
-            return False
-        return True
+            db.close()
+        except pymysql.Error:
+            pass
+
+    @contextmanager
+    def connection(self):
+        with self.slots:
+            try:
+                db = self.idle.get_nowait()
+                # health check, reopens the connection if the server dropped it
+                db.ping(reconnect=True)
+            except queue.Empty:
+                db = pymysql.connect(**self.params)
+            except pymysql.Error:
+                self.discard(db)
+                db = pymysql.connect(**self.params)
+            healthy = True
+            try:
+                yield db
+            except (pymysql.OperationalError, pymysql.InterfaceError):
+                healthy = False
+                self.discard(db)
+                raise
+            finally:
+                if healthy:
+                    self.idle.put(db)
 
-    def set_query(self, sql):
-        cursor = db.cursor()
+class MySQLConnection(object):
+    user_columns = ('user_id', 'tea', 'dmoj', 'last_dmoj_problem', 'can_repeat', 'codeforces', 'country', 'can_suggest')
+    server_columns = ('server_id', 'nickname_sync', 'role_sync', 'sync_source', 'join_message', 'prefix')
+    # identifiers can't be bound as parameters, so table and column names are checked against these instead
+    tables = {
+        'users': user_columns,
+        'servers': server_columns,
+        'subscriptions_contests': ('channel_id', 'subint')
+    }
+
+    # rows per UPDATE statement of a write-behind flush
+    write_batch = 500
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def check_column(self, table, *columns):
+        return table in self.tables and all(column in self.tables[table] for column in columns)
+
+    def set_query(self, sql, args=None):
+        with self.pool.connection() as db:
+            cursor = db.cursor()
+            try:
+                cursor.execute(sql, args)
+                db.commit()
+            except pymysql.Error as e:
+                db.rollback()
+                raise e
+
+    def set_many(self, sql, rows):
+        with self.pool.connection() as db:
+            cursor = db.cursor()
+            try:
+                cursor.executemany(sql, rows)
+                db.commit()
+            except pymysql.Error as e:
+                db.rollback()
+                raise e
+
+    def read_query(self, sql, args, fetch):
+        # reads are safe to repeat once on a fresh connection if the old one died mid-query
         try:
-            cursor.execute(sql)
-            db.commit()
-        except pymysql.Error as e:
-            db.rollback()
-            raise e
-
-    def readall_query(self, sql):
-        cursor = db.cursor()
-        cursor.execute(sql)
-        return cursor.fetchall()
+            with self.pool.connection() as db:
+                cursor = db.cursor()
+                cursor.execute(sql, args)
+                return fetch(cursor)
+        except (pymysql.OperationalError, pymysql.InterfaceError):
+            with self.pool.connection() as db:
+                cursor = db.cursor()
+                cursor.execute(sql, args)
+                return fetch(cursor)
+
+    def readall_query(self, sql, args=None):
+        return self.read_query(sql, args, lambda cursor: cursor.fetchall())
     
-    def readone_query(self, sql):
-        cursor = db.cursor()
-        cursor.execute(sql)
-        return cursor.fetchone()
+    def readone_query(self, sql, args=None):
+        return self.read_query(sql, args, lambda cursor: cursor.fetchone())
 
     def table_size(self, table):
-        if not self.sanitize_alnum(table):
+        if table not in self.tables:
             return -1
         return self.readone_query("SELECT COUNT(*) FROM %s" % table)[0]
 
     def exists(self, table, id_name, id):
-        if not self.sanitize_alnum(table, id_name, id):
+        if not self.check_column(table, id_name):
             return -1
-        sql = "SELECT EXISTS(SELECT * FROM %s WHERE %s = %d)" % (table, id_name, id)
-        return self.readone_query(sql)[0]
+        sql = "SELECT EXISTS(SELECT 1 FROM %s WHERE %s = %%s)" % (table, id_name)
+        return self.readone_query(sql, (id,))[0]
 
     def insert_ignore_user(self, user_id):
-        if not self.sanitize_id(user_id):
-            return -1
         sql = "INSERT IGNORE INTO users(user_id, tea, dmoj, last_dmoj_problem, can_repeat, codeforces, country, can_suggest) \
-            VALUES (%d, 0, NULL, NULL, TRUE, NULL, NULL, TRUE)" % \
-            (user_id)
+            VALUES (%s, 0, NULL, NULL, TRUE, NULL, NULL, TRUE)"
         with warnings.catch_warnings():
             warnings.simplefilter("ignore")
-            self.set_query(sql)
+            self.set_query(sql, (user_id,))
         return 0
 
     def user_count(self):
@@ -112,233 +138,361 @@ class MySQLConnection(object):
         return self.readone_query(sql)[0]
 
     def get_global_countries(self):
-        sql = "SELECT DISTINCT country FROM users WHERE country IS NOT NULL"
-        result = self.readall_query(sql)
-        countries = []
-        for row in result:
-            sql = "SELECT COUNT(*) FROM users WHERE country='%s'" % row[0]
-            countries.append(row[0] + ' - ' + str(self.readone_query(sql)[0]))
-        return countries
+        sql = "SELECT country, COUNT(*) FROM users WHERE country IS NOT NULL GROUP BY country"
+        return [country + ' - ' + str(count) for country, count in self.readall_query(sql)]
+
+    def get_user_stats(self):
+        users, dmoj, codeforces = self.readone_query("SELECT COUNT(*), COUNT(dmoj), COUNT(codeforces) FROM users")
+        countries = dict(self.readall_query("SELECT country, COUNT(*) FROM users WHERE country IS NOT NULL GROUP BY country"))
+        return {
+            'users': users,
+            'dmoj': dmoj,
+            'codeforces': codeforces,
+            'countries': countries
+        }
 
     def get_global_linked_count(self, row):
-        if not self.sanitize_alnum(row):
+        if not self.check_column('users', row):
             return -1
         sql = "SELECT COUNT(*) FROM users WHERE %s IS NOT NULL" % row
         return self.readone_query(sql)[0]
 
     def get_server(self, server_id):
-        if not self.sanitize_id(server_id):
-            return -1
-        sql = "SELECT * FROM servers WHERE server_id = %d" % server_id
-        row = self.readone_query(sql)
+        sql = "SELECT %s FROM servers WHERE server_id = %%s" % ', '.join(self.server_columns)
+        row = self.readone_query(sql, (server_id,))
         if row is None:
             return {}
-        server = {
-            row[0]: {
-                'nickname_sync': row[1],
-                'role_sync': row[2],
-                'sync_source': row[3],
-                'join_message': row[4],
-                'prefix': row[5]
-            }
-        }
-        return server
+        return {row[0]: dict(zip(self.server_columns[1:], row[1:]))}
 
     def get_user(self, user_id):
-        if not self.sanitize_id(user_id):
-            return -1
-        sql = "SELECT * FROM users WHERE user_id = %d" % user_id
-        row = self.readone_query(sql)
+        sql = "SELECT %s FROM users WHERE user_id = %%s" % ', '.join(self.user_columns)
+        row = self.readone_query(sql, (user_id,))
         if row is None:
             return {}
-        user = {
-            row[0]: {
-                'tea': row[1],
-                'dmoj': row[2],
-                'last_dmoj_problem': row[3],
-                'can_repeat': row[4],
-                'codeforces': row[5],
-                'country': row[6],
-                'can_suggest': row[7]
-            }
-        }
-        return user
+        return {row[0]: dict(zip(self.user_columns[1:], row[1:]))}
 
-    def get_user_by_row(self, row, key):
-        if not self.sanitize_id(row):
-            return -1
-        if not self.sanitize_alnum(key):
-            return -1
-        sql = "SELECT user_id, %s FROM (SELECT * FROM users LIMIT %d, %d) AS u WHERE u.%s IS NOT NULL" % \
-            (key, row, self.table_size('users')-row, key)
-        result = self.readone_query(sql)
-        if result is None:
-            return 0, {}
-        sql2 = "SELECT * FROM  (SELECT ROW_NUMBER() OVER ( ORDER BY user_id ) AS row_num, user_id FROM users) \
-                AS eu WHERE user_id='%s'" % (result[0])
-        new_row = self.readone_query(sql2)[0] + 1
-        user_data = {
-            'user_id': int(result[0]),
-            key: result[1]
-        }
-        return new_row, user_data
-
-    def get_next_user_by_row(self, row, key):
-        if row >= self.table_size('users'):
-            row = 0
-        return self.get_user_by_row(row, key)
-
-    def var_to_sql(self, value):
-        if value is None:
-            return "NULL"
-        elif value is True:
-            return "TRUE"
-        elif value is False:
-            return "False"
-        elif type(value) is int:
-            return value
-        return "'%s'" % value
+    def get_linked_handles(self, key, user_ids):
+        if not self.check_column('users', key) or len(user_ids) == 0:
+            return {}
+        sql = "SELECT user_id, %s FROM users WHERE %s IS NOT NULL AND user_id IN (%s)" % (key, key, ', '.join(['%s'] * len(user_ids)))
+        return dict(self.readall_query(sql, tuple(user_ids)))
+
+    def get_linked_users_after(self, key, last_id, limit):
+        if not self.check_column('users', key):
+            return []
+        sql = "SELECT user_id, %s FROM users WHERE user_id > %%s AND %s IS NOT NULL ORDER BY user_id LIMIT %%s" % (key, key)
+        return [{'user_id': int(user_id), key: handle} for user_id, handle in self.readall_query(sql, (last_id, limit))]
 
     def update_user(self, user_id, field, value):
-        if not self.sanitize_alnum(field, value) or not self.sanitize_id(user_id):
+        if field not in self.user_columns[1:]:
             return -1
-        sql = "UPDATE users SET %s = %s \
-                WHERE user_id = %d" % \
-                (field, self.var_to_sql(value), user_id)
-        self.set_query(sql)
+        sql = "UPDATE users SET %s = %%s WHERE user_id = %%s" % field
+        self.set_query(sql, (value, user_id))
         return 0
 
     def insert_ignore_server(self, server_id):
-        if not self.sanitize_id(server_id):
-            return -1
         sql = "INSERT IGNORE INTO servers(server_id, nickname_sync, role_sync, sync_source, join_message) \
-            VALUES (%d, FALSE, FALSE, 'dmoj', FALSE)" % \
-            (server_id)
+            VALUES (%s, FALSE, FALSE, 'dmoj', FALSE)"
         with warnings.catch_warnings():
             warnings.simplefilter("ignore")
-            self.set_query(sql)
+            self.set_query(sql, (server_id,))
         return 0
 
     def update_server(self, server_id, field, value):
-        if not self.sanitize_alnum(field, value) or not self.sanitize_id(server_id):
+        if field not in self.server_columns[1:]:
             return -1
-        sql = "UPDATE servers SET %s = %s \
-                WHERE server_id = %d" % \
-                (field, self.var_to_sql(value), server_id)
-        self.set_query(sql)
+        sql = "UPDATE servers SET %s = %%s WHERE server_id = %%s" % field
+        self.set_query(sql, (value, server_id))
         return 0
 
     def update_server_prefix(self, server_id, fix):
-        sql = "UPDATE servers SET prefix = '%s' WHERE server_id = %d" % (fix, server_id)
-        self.set_query(sql)
+        return self.update_server(server_id, 'prefix', fix)
+
+    def write_updates(self, table, field, updates):
+        if not self.check_column(table, field) or field == self.tables[table][0]:
+            return -1
+        # executemany only folds INSERT ... VALUES into one statement, so each batch is a single UPDATE with a CASE
+        key = self.tables[table][0]
+        rows = list(updates.items())
+        for start in range(0, len(rows), self.write_batch):
+            batch = rows[start:start+self.write_batch]
+            sql = "UPDATE %s SET %s = CASE %s %s END WHERE %s IN (%s)" % (
+                table, field, key, ' '.join(['WHEN %s THEN %s'] * len(batch)), key, ', '.join(['%s'] * len(batch)))
+            self.set_query(sql, [arg for row in batch for arg in row] + [id for id, value in batch])
         return 0
 
     def get_prefixes(self):
-        sql = "SELECT * FROM servers \
-        WHERE prefix IS NOT NULL"
-        result = self.readall_query(sql)
-        server_to_prefix = {}
-        for row in result:
-            server_to_prefix[row[0]] = row[4]
-        return server_to_prefix
+        sql = "SELECT server_id, prefix FROM servers WHERE prefix IS NOT NULL"
+        return dict(self.readall_query(sql))
 
     def get_prefix(self, server_id):
-        if not self.sanitize_id(server_id):
+        sql = "SELECT prefix FROM servers WHERE server_id = %s"
+        result = self.readone_query(sql, (server_id,))
+        if result is None:
             return None
-        sql = "SELECT prefix FROM servers \
-        WHERE server_id=%d" % server_id
-        return self.readone_query(sql)[0]
+        return result[0]
 
     def get_all_sync_source(self):
-        sql = "SELECT server_id, sync_source from servers"
-        result = self.readall_query(sql)
-        sync_sources = {}
-        for row in result:
-            sync_sources[row[0]] = row[1]
-        return sync_sources
+        sql = "SELECT server_id, sync_source FROM servers"
+        return dict(self.readall_query(sql))
 
     def get_all_role_sync(self, site):
-        if not self.sanitize_alnum(site):
-            return -1
-        sql = "SELECT * FROM servers \
-        WHERE role_sync AND sync_source = '%s'" % site
-        result = self.readall_query(sql)
-        servers = []
-        for row in result:
-            servers.append(row[0])
-        return servers
+        sql = "SELECT server_id FROM servers WHERE role_sync AND sync_source = %s"
+        return [row[0] for row in self.readall_query(sql, (site,))]
 
     def get_all_nick_sync(self, site):
-        if not self.sanitize_alnum(site):
-            return -1
-        sql = "SELECT * FROM servers \
-        WHERE nickname_sync AND sync_source = '%s'" % site
-        result = self.readall_query(sql)
-        servers = []
-        for row in result:
-            servers.append(row[0])
-        return servers
+        sql = "SELECT server_id FROM servers WHERE nickname_sync AND sync_source = %s"
+        return [row[0] for row in self.readall_query(sql, (site,))]
 
     def get_join_message(self, server_id):
-        if not self.sanitize_id(server_id):
-            return -1
-        sql = "SELECT join_message from servers WHERE server_id = %d" % server_id
-        result = self.readone_query(sql)
+        sql = "SELECT join_message FROM servers WHERE server_id = %s"
+        result = self.readone_query(sql, (server_id,))
         if result is None:
             return False
         return result[0]
 
     def get_cf_handles(self):
-        sql = "SELECT user_id, codeforces FROM users WHERE codeforces IS NOT NULL"
-        result = self.readall_query(sql)
-        handles = {}
-        for row in result:
-            handles[row[1]] = row[0]
-        return handles
+        sql = "SELECT codeforces, user_id FROM users WHERE codeforces IS NOT NULL"
+        return dict(self.readall_query(sql))
 
     def get_subbed_ojs(self, channel_id):
-        if not self.sanitize_id(channel_id):
-            return -1
-        sql = "SELECT subint FROM subscriptions_contests WHERE channel_id = %d" % channel_id
-        result = self.readone_query(sql)
+        sql = "SELECT subint FROM subscriptions_contests WHERE channel_id = %s"
+        result = self.readone_query(sql, (channel_id,))
         if result is None:
             return False
         return result[0]
 
     def update_subbed_ojs(self, channel_id, subint):
-        sql = "UPDATE subscriptions_contests SET subint = '%s' WHERE channel_id = %d" % (subint, channel_id)
-        self.set_query(sql)
+        sql = "UPDATE subscriptions_contests SET subint = %s WHERE channel_id = %s"
+        self.set_query(sql, (subint, channel_id))
         return 0
 
     def sub_channel(self, channel_id):
-        if not self.sanitize_id(channel_id):
-            return -1
-        sql = "INSERT INTO subscriptions_contests(channel_id) \
-            VALUES (%d)" % \
-            (channel_id)
-        self.set_query(sql)
+        sql = "INSERT INTO subscriptions_contests(channel_id) VALUES (%s)"
+        self.set_query(sql, (channel_id,))
         return 0
 
     def unsub_channel(self, channel_id):
-        if not self.sanitize_id(channel_id):
-            return -1
-        sql = "DELETE FROM subscriptions_contests WHERE channel_id = %d" % channel_id
-        self.set_query(sql)
+        sql = "DELETE FROM subscriptions_contests WHERE channel_id = %s"
+        self.set_query(sql, (channel_id,))
         return 0
 
     def get_all_subs(self):
         sql = "SELECT channel_id FROM subscriptions_contests"
-        result = self.readall_query(sql)
-        channels = []
-        for row in result:
-            channels.append(row[0])
-        return channels
+        return [row[0] for row in self.readall_query(sql)]
+
+class AsyncMySQLConnection(object):
+    """Runs MySQLConnection queries on a thread pool so callers can await them without blocking the event loop"""
+
+    def __init__(self, connection, workers):
+        self.sync = connection
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='mysql')
+
+    def __getattr__(self, name):
+        method = getattr(self.sync, name)
+        async def run(*args):
+            return await self.run(method, *args)
+        return run
+
+    async def run(self, method, *args):
+        return await asyncio.get_event_loop().run_in_executor(self.executor, partial(method, *args))
+
+class CachedMySQLConnection(AsyncMySQLConnection):
+    """
+    Keeps users and servers rows in memory once read. Existence inserts run once per id,
+    and updates are written behind in batches at most flush_interval seconds later.
+    """
+    flush_interval = 5
+    stats_interval = 60*60
+
+    def __init__(self, connection, workers):
+        AsyncMySQLConnection.__init__(self, connection, workers)
+        self.rows = {'users': {}, 'servers': {}}
+        self.known = {'users': set(), 'servers': set()}
+        # table: field: id: value
+        self.dirty = {'users': {}, 'servers': {}}
+        self.writing = {'users': {}, 'servers': {}}
+        self.flushing = None
+        self.flush_lock = asyncio.Lock()
+        self.stats = None
+        # counter changes made while the aggregate is re-read, replayed onto it
+        self.stats_changes = None
+        self.stats_time = 0
+        self.stats_refreshing = False
+        atexit.register(self.flush_now)
+
+    async def get_row(self, table, id):
+        if id not in self.rows[table]:
+            load = self.sync.get_user if table == 'users' else self.sync.get_server
+            row = await self.run(load, id)
+            if not isinstance(row, dict) or id not in row:
+                return {}
+            # updates that have not reached the database yet win over what was just read
+            for pending in (self.writing[table], self.dirty[table]):
+                for field, updates in pending.items():
+                    if id in updates:
+                        row[id][field] = updates[id]
+            self.rows[table][id] = row[id]
+            self.known[table].add(id)
+        return {id: dict(self.rows[table][id])}
+
+    async def get_user(self, user_id):
+        return await self.get_row('users', user_id)
+
+    async def get_server(self, server_id):
+        return await self.get_row('servers', server_id)
+
+    async def insert_ignore_user(self, user_id):
+        if user_id in self.known['users']:
+            return 0
+        result = await self.run(self.sync.insert_ignore_user, user_id)
+        if result == 0:
+            self.known['users'].add(user_id)
+        return result
+
+    async def insert_ignore_server(self, server_id):
+        if server_id in self.known['servers']:
+            return 0
+        result = await self.run(self.sync.insert_ignore_server, server_id)
+        if result == 0:
+            self.known['servers'].add(server_id)
+        return result
+
+    def update_row(self, table, id, field, value):
+        if field not in self.sync.tables[table][1:]:
+            return -1
+        if id in self.rows[table]:
+            if table == 'users':
+                self.count_change(field, self.rows[table][id][field], value)
+            self.rows[table][id][field] = value
+        self.dirty[table].setdefault(field, {})[id] = value
+        self.schedule_flush()
+        return 0
+
+    async def update_user(self, user_id, field, value):
+        return self.update_row('users', user_id, field, value)
+
+    async def update_server(self, server_id, field, value):
+        return self.update_row('servers', server_id, field, value)
+
+    async def update_server_prefix(self, server_id, fix):
+        return self.update_row('servers', server_id, 'prefix', fix)
+
+    async def get_linked_handles(self, key, user_ids):
+        handles = await self.run(self.sync.get_linked_handles, key, user_ids)
+        ids = set(user_ids)
+        for pending in (self.writing['users'], self.dirty['users']):
+            for id, value in pending.get(key, {}).items():
+                if id not in ids:
+                    continue
+                if value is None:
+                    handles.pop(id, None)
+                else:
+                    handles[id] = value
+        return handles
+
+    def count_change(self, field, old, new):
+        if self.stats_changes is not None:
+            self.stats_changes.append((field, old, new))
+        if self.stats is not None:
+            self.apply_change(self.stats, field, old, new)
+
+    def apply_change(self, stats, field, old, new):
+        if old == new:
+            return
+        if field in ('dmoj', 'codeforces'):
+            stats[field] += (new is not None) - (old is not None)
+        elif field == 'country':
+            countries = stats['countries']
+            if old is not None:
+                countries[old] = countries.get(old, 1) - 1
+                if countries[old] <= 0:
+                    del countries[old]
+            if new is not None:
+                countries[new] = countries.get(new, 0) + 1
+
+    async def refresh_stats(self):
+        try:
+            async with self.flush_lock:
+                # updates that are not written yet are missing from the aggregate, so they are written first.
+                # Changes made from then on are replayed onto it, and no flush can write them before it is read
+                self.stats_changes = []
+                await self.write_dirty()
+                stats = await self.run(self.sync.get_user_stats)
+                for field, old, new in self.stats_changes:
+                    self.apply_change(stats, field, old, new)
+            self.stats = stats
+            self.stats_time = monotonic()
+        finally:
+            self.stats_changes = None
+            self.stats_refreshing = False
+
+    async def get_stats(self):
+        if self.stats is None:
+            self.stats_refreshing = True
+            await self.refresh_stats()
+        elif monotonic() - self.stats_time > self.stats_interval and not self.stats_refreshing:
+            # the aggregate is re-read in the background, counters in between come from update_user
+            self.stats_refreshing = True
+            asyncio.ensure_future(self.refresh_stats())
+        return self.stats
+
+    async def get_prefix(self, server_id):
+        server = await self.get_server(server_id)
+        return server[server_id]['prefix'] if server else None
+
+    async def get_join_message(self, server_id):
+        server = await self.get_server(server_id)
+        return server[server_id]['join_message'] if server else False
+
+    def schedule_flush(self):
+        if self.flushing is None:
+            self.flushing = asyncio.ensure_future(self.flush_later())
+
+    async def flush_later(self):
+        # only one flush runs at a time, so batches for the same field reach the database in order
+        try:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+        finally:
+            self.flushing = None
+        # updates made while the batch was being written, and failed batches, go out with the next flush
+        if any(self.dirty.values()):
+            self.schedule_flush()
+
+    async def flush(self):
+        async with self.flush_lock:
+            await self.write_dirty()
+
+    async def write_dirty(self):
+        dirty, self.dirty = self.dirty, {'users': {}, 'servers': {}}
+        self.writing = dirty
+        for table, fields in dirty.items():
+            for field, updates in fields.items():
+                try:
+                    await self.run(self.sync.write_updates, table, field, updates)
+                except pymysql.Error:
+                    traceback.print_exc()
+                    # keep the failed batch for the next flush unless it was overwritten since
+                    pending = self.dirty[table].setdefault(field, {})
+                    for id, value in updates.items():
+                        pending.setdefault(id, value)
+        self.writing = {'users': {}, 'servers': {}}
+
+    def flush_now(self):
+        # the batch a flush was writing when the loop stopped may not have been committed, so it is written again first
+        for batch in (self.writing, self.dirty):
+            for table, fields in batch.items():
+                for field, updates in fields.items():
+                    self.sync.write_updates(table, field, updates)
+        self.writing = {'users': {}, 'servers': {}}
+        self.dirty = {'users': {}, 'servers': {}}
+
+# autocommit, so a pooled connection that only serves reads doesn't keep its first REPEATABLE READ snapshot
+# and miss rows committed through the other connections
+pool = ConnectionPool(pool_size, host='localhost', user=user, password=password, database=database, autocommit=True)
 
 if __name__ == "__main__":
-    cursor = db.cursor()
-    cursor.execute("SELECT VERSION()")
-    data = cursor.fetchone()
-    print("Database version: %s " % data)
-    db.close()
+    print("Database version: %s " % MySQLConnection(pool).readone_query("SELECT VERSION()"))
 
-mySQLConnection = MySQLConnection()
+mySQLConnection = CachedMySQLConnection(MySQLConnection(pool), pool_size)
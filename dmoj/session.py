@@ -1,8 +1,9 @@
-import bs4 as bs
 import hashlib
 from dmoj.language import Language
 from dmoj.result import Result
 from dmoj.testcase import Testcase
+from utils import htmlparse
+from utils.htmlparse import parsec
 from utils.webclient import webc
 from aiohttp import ClientError
 
@@ -29,8 +30,7 @@ class Session:
     async def generate(self):
         try:
             doc = await webc.webget_text(self.BASE_URL + '/edit/profile/', headers={'Authorization': 'Bearer %s' % self.token})
-            soup = bs.BeautifulSoup(doc, 'lxml')
-            self.handle = soup.find('span', attrs={'id' : 'user-links'}).find('b').contents[0]
+            self.handle = await parsec.run(htmlparse.parse_dmoj_profile_handle, doc)
             noAuthReq = await webc.webget_text(self.BASE_URL + '/user/' + self.handle)
             self.hash = hashlib.sha256((str(self.user.id) + self.handle).encode('utf-8')).hexdigest()
             if self.hash not in noAuthReq:
@@ -62,10 +62,10 @@ class Session:
             req = await self.getAuthRequest(self.BASE_URL + '/widgets/single_submission?id=' + str(id))
         except ClientError:
             raise InvalidDMOJSessionException
-        soup = bs.BeautifulSoup(req, 'lxml')
-        status = soup.find_all('span', attrs={'class' : 'status'})[0].contents[0]
-        time = soup.find_all('div',  attrs={'class' : 'time'})[-1].contents[0].strip()
-        memory = soup.find_all('div',  attrs={'class' : 'memory'})[0].contents[0]
+        submission = htmlparse.parse_dmoj_submission(req)
+        status = submission['status']
+        time = submission['time']
+        memory = submission['memory']
         done = status not in self.gradingStatuses
 
         if memory == '---':
@@ -73,36 +73,21 @@ class Session:
         if time == '---':
             time = None
 
-        problemName = soup.find_all('div',  attrs={'class' : 'name'})[0].find('a').contents[0]
+        problemName = submission['problem']
 
         try:
             req = await self.getAuthRequest(self.BASE_URL + '/widgets/submission_testcases?id=' + str(id))
         except ClientError:
             raise InvalidDMOJSessionException
-        soup = bs.BeautifulSoup(req, 'lxml')
-        raw_result = soup.find('body').contents[0]
+        testcases = htmlparse.parse_dmoj_testcases(req)
 
         cases = []
-
-        try:
-            caseTable = soup.find_all('table', attrs={'class': 'submissions-status-table'})[0]
-        except IndexError:
-            return Result(cases, raw_result, status, problemName, time, memory, done)
-
-        for row in caseTable.find_all('tr'):
+        for case in testcases['cases']:
             testcase = Testcase()
-            try:
-                testcase.id = int(row.get('id'))
-            except ValueError:
-                continue
-            children = row.find_all('td')
-            testcase.descriptor = children[0].find('b').contents[0]
-            testcase.status = children[1].find('span').contents[0]
-            testcase.details = {
-                'time': children[2].find('span').contents[0].replace(',', ''),
-                'memory': children[3].contents[0].replace('\xa0', ' ').replace(']', ''),
-                'points': children[4].contents[0]
-            }
-            cases.append(testcase)            
-
-        return Result(cases, raw_result, status, problemName, time, memory, done)        
+            testcase.id = case['id']
+            testcase.descriptor = case['descriptor']
+            testcase.status = case['status']
+            testcase.details = case['details']
+            cases.append(testcase)
+
+        return Result(cases, testcases['raw_result'], status, problemName, time, memory, done)
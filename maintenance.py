@@ -5,7 +5,7 @@ import yaml
 from connector import mySQLConnection as query
 
 
-custom_prefixes = query.get_prefixes()
+custom_prefixes = query.sync.get_prefixes()
 
 try:
     config_file = open('config.yml')
@@ -0,0 +1,83 @@
+import os
+import re
+import sys
+import pymysql
+from connector import pool
+
+migrations_directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+# the queries connector.MySQLConnection runs on hot paths, checked for full table scans after migrating
+# (name, sql, args, whether a full scan is expected)
+explain_queries = (
+    ('get_user', "SELECT user_id FROM users WHERE user_id = %s", (0,), False),
+    ('get_server', "SELECT server_id FROM servers WHERE server_id = %s", (0,), False),
+    ('get_linked_handles', "SELECT user_id, dmoj FROM users WHERE dmoj IS NOT NULL AND user_id IN (%s, %s)", (0, 1), False),
+    ('get_linked_users_after dmoj', "SELECT user_id, dmoj FROM users WHERE user_id > %s AND dmoj IS NOT NULL ORDER BY user_id LIMIT %s", (0, 5), False),
+    ('get_linked_users_after codeforces', "SELECT user_id, codeforces FROM users WHERE user_id > %s AND codeforces IS NOT NULL ORDER BY user_id LIMIT %s", (0, 5), False),
+    # counts every row by design, it only runs hourly in the background for $stats
+    ('get_user_stats counts', "SELECT COUNT(*), COUNT(dmoj), COUNT(codeforces) FROM users", None, True),
+    ('get_user_stats countries', "SELECT country, COUNT(*) FROM users WHERE country IS NOT NULL GROUP BY country", None, False),
+    ('get_all_role_sync', "SELECT server_id FROM servers WHERE role_sync AND sync_source = %s", ('dmoj',), False),
+    ('get_all_nick_sync', "SELECT server_id FROM servers WHERE nickname_sync AND sync_source = %s", ('dmoj',), False)
+)
+
+
+def migrations():
+    found = []
+    for name in sorted(os.listdir(migrations_directory)):
+        match = re.match(r'^(\d+)_\w+\.sql$', name)
+        if match:
+            found.append((int(match.group(1)), name))
+    return found
+
+def statements(path):
+    with open(path, 'r') as f:
+        sql = '\n'.join(line for line in f.read().split('\n') if not line.strip().startswith('--'))
+    return [statement.strip() for statement in sql.split(';') if statement.strip() != '']
+
+def current_version(cursor):
+    cursor.execute("""CREATE TABLE IF NOT EXISTS schema_version (
+        version INT NOT NULL,
+        name VARCHAR(255),
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (version))""")
+    cursor.execute("SELECT MAX(version) FROM schema_version")
+    return cursor.fetchone()[0] or 0
+
+def migrate():
+    with pool.connection() as db:
+        cursor = db.cursor()
+        version = current_version(cursor)
+        for number, name in migrations():
+            if number <= version:
+                continue
+            # MySQL commits each DDL statement on its own, so a migration that fails halfway can't be rolled back.
+            # Migrations therefore hold a single statement, or only statements that are safe to run again.
+            for statement in statements(os.path.join(migrations_directory, name)):
+                cursor.execute(statement)
+            cursor.execute("INSERT INTO schema_version(version, name) VALUES (%s, %s)", (number, name))
+            db.commit()
+            print('Applied migration %s' % name)
+            version = number
+    return version
+
+def explain(verbose=False):
+    full_scans = []
+    with pool.connection() as db:
+        cursor = db.cursor(pymysql.cursors.DictCursor)
+        for name, sql, args, scans in explain_queries:
+            cursor.execute('EXPLAIN ' + sql, args)
+            for row in cursor.fetchall():
+                if verbose:
+                    print('%s: table=%s type=%s key=%s rows=%s' % (name, row['table'], row['type'], row['key'], row['rows']))
+                if row['type'] == 'ALL' and not scans:
+                    full_scans.append(name)
+    return full_scans
+
+if __name__ == '__main__':
+    print('Schema version: %d' % migrate())
+    if '--explain' in sys.argv:
+        full_scans = explain(verbose=True)
+        if len(full_scans) > 0:
+            print('Full table scans: %s' % ', '.join(full_scans))
+            sys.exit(1)
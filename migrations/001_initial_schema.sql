@@ -0,0 +1,24 @@
+CREATE TABLE IF NOT EXISTS servers (
+    server_id BIGINT NOT NULL,
+    nickname_sync BOOLEAN,
+    role_sync BOOLEAN,
+    sync_source VARCHAR(20),
+    join_message BOOLEAN DEFAULT FALSE,
+    prefix VARCHAR(255),
+    PRIMARY KEY (server_id));
+
+CREATE TABLE IF NOT EXISTS subscriptions_contests (
+    channel_id BIGINT NOT NULL,
+    subint INT DEFAULT 63,
+    PRIMARY KEY (channel_id));
+
+CREATE TABLE IF NOT EXISTS users (
+    user_id BIGINT NOT NULL,
+    tea INT,
+    dmoj VARCHAR(255),
+    last_dmoj_problem VARCHAR(255),
+    can_repeat BOOLEAN,
+    codeforces VARCHAR(255),
+    country VARCHAR(255),
+    can_suggest BOOLEAN,
+    PRIMARY KEY (user_id));
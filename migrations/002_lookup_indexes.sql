@@ -0,0 +1,5 @@
+-- secondary indexes on InnoDB carry the primary key, so these also cover user_id lookups
+ALTER TABLE users
+    ADD INDEX users_dmoj (dmoj),
+    ADD INDEX users_codeforces (codeforces),
+    ADD INDEX users_country (country);
@@ -0,0 +1,3 @@
+ALTER TABLE servers
+    ADD INDEX servers_role_sync (sync_source, role_sync),
+    ADD INDEX servers_nickname_sync (sync_source, nickname_sync);
@@ -0,0 +1,258 @@
+import os
+import sys
+import pickle
+import random as rand
+from bisect import bisect_left, bisect_right
+from utils.trigramindex import TrigramIndex
+
+
+def intern_all(values):
+    return tuple(sys.intern(value) for value in values)
+
+def normalize_tag(tag):
+    return ' '.join(tag.lower().replace('_', ' ').replace('-', ' ').split())
+
+class Problem(object):
+    __slots__ = ('key', 'name', 'points', 'tags')
+    judge = None
+
+    def __init__(self, key, name, points=None, tags=()):
+        self.key = key
+        self.name = name
+        self.points = points
+        self.tags = intern_all(tags)
+
+    def labels(self):
+        return self.tags
+
+    def row(self):
+        return tuple(getattr(self, slot) for cls in type(self).__mro__ for slot in getattr(cls, '__slots__', ()))
+
+class DMOJProblem(Problem):
+    __slots__ = ('group', 'partial')
+    judge = 'dmoj'
+
+    def __init__(self, code, name, points, group, types, partial):
+        Problem.__init__(self, code, name, points, types)
+        self.group = sys.intern(group)
+        self.partial = partial
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data['code'], data['name'], data['points'], data['group'], data['types'], data['partial'])
+
+    def labels(self):
+        return self.tags + (self.group,)
+
+    @property
+    def url(self):
+        return 'https://dmoj.ca/problem/' + self.key
+
+class CodeforcesProblem(Problem):
+    __slots__ = ('type', 'score')
+    judge = 'codeforces'
+
+    def __init__(self, contest, index, name, rating, type, score, tags):
+        Problem.__init__(self, (contest, index), name, rating, tags)
+        self.type = sys.intern(type)
+        self.score = score
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data.get('contestId', data.get('problemsetName')), data['index'], data['name'], data.get('rating'), data['type'], data.get('points'), data['tags'])
+
+    @property
+    def url(self):
+        return 'https://codeforces.com/problemset/problem/' + str(self.key[0]) + '/' + str(self.key[1])
+
+class AtCoderProblem(Problem):
+    __slots__ = ('contest_id', 'solver_count')
+    judge = 'atcoder'
+
+    def __init__(self, id, contest_id, title, point, solver_count):
+        Problem.__init__(self, id, title, point or None)
+        self.contest_id = sys.intern(contest_id)
+        self.solver_count = solver_count
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data['id'], data['contest_id'], data['title'], data.get('point'), data.get('solver_count'))
+
+    @property
+    def url(self):
+        return 'https://atcoder.jp/contests/' + self.contest_id + '/tasks/' + self.key
+
+class CSESProblem(Problem):
+    __slots__ = ('url', 'rate', 'group')
+    judge = 'cses'
+
+    def __init__(self, id, name, url, rate, group):
+        Problem.__init__(self, id, name)
+        self.url = url
+        self.rate = rate
+        self.group = sys.intern(group)
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data['id'], data['name'], data['url'], data['rate'], data['group'])
+
+    def labels(self):
+        return (self.group,)
+
+class SzkopulProblem(Problem):
+    __slots__ = ('url', 'submitters', 'percent_correct', 'average')
+    judge = 'szkopul'
+
+    def __init__(self, id, title, url, tags, submitters, percent_correct=None, average=None):
+        Problem.__init__(self, id, title, None, tags)
+        self.url = url
+        self.submitters = submitters
+        self.percent_correct = percent_correct
+        self.average = average
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data['id'], data['title'], data['url'], data['tags'], data['submitters'], data.get('percent_correct'), data.get('average'))
+
+class LeetCodeProblem(Problem):
+    __slots__ = ('url', 'total_acs', 'total_submitted', 'paid')
+    judge = 'leetcode'
+
+    def __init__(self, id, title, url, level, total_acs, total_submitted, paid):
+        Problem.__init__(self, id, title, level)
+        self.url = url
+        self.total_acs = total_acs
+        self.total_submitted = total_submitted
+        self.paid = paid
+
+    @classmethod
+    def from_json(cls, data):
+        stat = data['stat']
+        return cls(stat['frontend_question_id'], stat['question__title'], 'https://leetcode.com/problems/' + stat['question__title_slug'],
+                   data['difficulty']['level'], stat['total_acs'], stat['total_submitted'], data['paid_only'])
+
+
+bit_counts = bytes(bin(byte).count('1') for byte in range(256))
+
+class Catalog(object):
+    snapshot_format = 2
+    rejection_attempts = 8
+
+    def __init__(self, problems=(), version=0):
+        self.problems = tuple(problems)
+        self.version = version
+        # positions in order are the dense bit indices: rated problems by points, then unrated ones
+        self.order = sorted(range(len(self.problems)), key=lambda id: (self.problems[id].points is None, self.problems[id].points or 0))
+        self.sorted_points = [self.problems[id].points for id in self.order if self.problems[id].points is not None]
+        self.positions = None
+        self.titles = None
+        self.tag_masks = {}
+        tag_bits = {}
+        for position, id in enumerate(self.order):
+            for tag in set(map(normalize_tag, self.problems[id].labels())):
+                if tag not in tag_bits:
+                    tag_bits[tag] = bytearray((len(self.order)+7)//8)
+                tag_bits[tag][position >> 3] |= 1 << (position & 7)
+        for tag, bits in tag_bits.items():
+            self.tag_masks[sys.intern(tag)] = int.from_bytes(bits, 'little')
+
+    def __len__(self):
+        return len(self.problems)
+
+    def __getitem__(self, id):
+        return self.problems[id]
+
+    def __iter__(self):
+        return iter(self.problems)
+
+    def span(self, low, high):
+        return bisect_left(self.sorted_points, low), bisect_right(self.sorted_points, high)
+
+    def mask(self, keys):
+        if self.positions is None:
+            self.positions = {self.problems[id].key: position for position, id in enumerate(self.order)}
+        bits = bytearray((len(self.order)+7)//8)
+        for key in keys:
+            position = self.positions.get(key)
+            if position is not None:
+                bits[position >> 3] |= 1 << (position & 7)
+        return int.from_bytes(bits, 'little')
+
+    def index_titles(self):
+        if self.titles is None:
+            self.titles = TrigramIndex(problem.name for problem in self.problems)
+        return self.titles
+
+    @property
+    def title_index(self):
+        return self.index_titles()
+
+    def tags_mask(self, tags):
+        mask = -1
+        for tag in tags:
+            mask &= self.tag_masks.get(normalize_tag(tag), 0)
+        return mask
+
+    def sample_position(self, start, end, excluded=0, included=-1):
+        if start >= end:
+            return None
+        for attempt in range(self.rejection_attempts):
+            position = rand.randrange(start, end)
+            if included >> position & 1 and not excluded >> position & 1:
+                return position
+        available = ((1 << end) - (1 << start)) & included & ~excluded
+        count = bin(available).count('1')
+        if count == 0:
+            return None
+        skip = rand.randrange(count)
+        for index, byte in enumerate(available.to_bytes((end+7)//8, 'little')[start >> 3:], start >> 3):
+            if skip >= bit_counts[byte]:
+                skip -= bit_counts[byte]
+                continue
+            for bit in range(8):
+                if byte >> bit & 1:
+                    if skip == 0:
+                        return index*8 + bit
+                    skip -= 1
+
+    def sample_many(self, start, end, count, excluded=0, included=-1, spread=False):
+        ids = []
+        for index in range(count):
+            position = None
+            if spread:
+                position = self.sample_position(start + (end-start)*index//count, start + (end-start)*(index+1)//count, excluded, included)
+            if position is None:
+                position = self.sample_position(start, end, excluded, included)
+            if position is None:
+                break
+            excluded |= 1 << position
+            ids.append(self.order[position])
+        return ids
+
+    def patched(self, problems):
+        current = {problem.key: problem for problem in self.problems}
+        latest = {problem.key: problem for problem in problems}
+        added = [problem for key, problem in latest.items() if key not in current]
+        removed = [key for key in current if key not in latest]
+        changed = {key: problem for key, problem in latest.items() if key in current and problem.row() != current[key].row()}
+        if not added and not removed and not changed:
+            return self, (0, 0, 0)
+        kept = (changed.get(problem.key, problem) for problem in self.problems if problem.key in latest)
+        return type(self)(tuple(kept) + tuple(added)), (len(added), len(removed), len(changed))
+
+    def save_snapshot(self, path, fetched_at):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.tmp', 'wb') as f:
+            pickle.dump((self.snapshot_format, fetched_at, self.version, self.problems), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + '.tmp', path)
+
+    @classmethod
+    def load_snapshot(cls, path):
+        try:
+            with open(path, 'rb') as f:
+                snapshot_format, fetched_at, version, problems = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, AttributeError, EOFError, ValueError, TypeError):
+            return None, 0
+        if snapshot_format != cls.snapshot_format:
+            return None, 0
+        return cls(problems, version), fetched_at
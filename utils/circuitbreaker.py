@@ -0,0 +1,73 @@
+import aiohttp
+from collections import deque
+from time import monotonic
+
+
+class CircuitOpenException(aiohttp.ClientError):
+    def __init__(self, host, retry_in):
+        self.host = host
+        self.retry_in = retry_in
+
+    def __str__(self):
+        return '%s is unavailable, retrying in %ds' % (self.host, self.retry_in)
+
+class CircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, threshold=5, cooldown=30, max_cooldown=600, window=50):
+        self.threshold = threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened = None
+        self.probing = False
+        self.results = deque(maxlen=window)
+
+    @property
+    def state(self):
+        if self.opened is None:
+            return self.CLOSED
+        if monotonic() - self.opened < self.cooldown:
+            return self.OPEN
+        return self.HALF_OPEN
+
+    def retry_in(self):
+        if self.opened is None:
+            return 0
+        return max(0, self.cooldown - (monotonic() - self.opened))
+
+    def error_rate(self):
+        if len(self.results) == 0:
+            return 0
+        return self.results.count(False) / len(self.results)
+
+    def allow(self):
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self.probing:
+            self.probing = True
+            return True
+        return False
+
+    def cancel(self):
+        self.probing = False
+
+    def record(self, ok):
+        self.results.append(ok)
+        if ok:
+            self.failures = 0
+            self.opened = None
+            self.probing = False
+            self.cooldown = self.base_cooldown
+            return
+        self.failures += 1
+        if self.probing:
+            self.probing = False
+            self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+            self.opened = monotonic()
+        elif self.opened is None and self.failures >= self.threshold:
+            self.opened = monotonic()
@@ -0,0 +1,81 @@
+import asyncio
+import heapq
+import itertools
+from time import monotonic
+
+
+class Priority:
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+
+class HostLimiter:
+
+    def __init__(self, rate, burst, concurrency):
+        self.rate = rate
+        self.burst = burst
+        self.concurrency = concurrency
+        self.tokens = burst
+        self.updated = monotonic()
+        self.in_flight = 0
+        self.waiters = []
+        self.counter = itertools.count()
+        self.timer = None
+
+    def refill(self):
+        now = monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def dispatch(self):
+        self.timer = None
+        while self.waiters and self.in_flight < self.concurrency:
+            if self.waiters[0][2].done():
+                heapq.heappop(self.waiters)
+                continue
+            self.refill()
+            if self.tokens < 1:
+                self.timer = asyncio.get_event_loop().call_later((1 - self.tokens) / self.rate, self.dispatch)
+                return
+            self.tokens -= 1
+            self.in_flight += 1
+            heapq.heappop(self.waiters)[2].set_result(None)
+
+    async def acquire(self, priority=Priority.INTERACTIVE):
+        if not self.waiters and self.in_flight < self.concurrency:
+            self.refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                self.in_flight += 1
+                return
+        future = asyncio.get_event_loop().create_future()
+        heapq.heappush(self.waiters, (priority, next(self.counter), future))
+        if self.timer is None:
+            self.dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        self.in_flight -= 1
+        if self.timer is None:
+            self.dispatch()
+
+    def queued(self):
+        return sum(1 for waiter in self.waiters if not waiter[2].done())
+
+
+class HostLimiterGroup:
+
+    def __init__(self, limits, default):
+        self.limits = limits
+        self.default = default
+        self.limiters = {}
+
+    def get(self, host):
+        if host not in self.limiters:
+            self.limiters[host] = HostLimiter(*self.limits.get(host, self.default))
+        return self.limiters[host]
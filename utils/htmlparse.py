@@ -0,0 +1,186 @@
+import re
+import asyncio
+import multiprocessing
+import bs4 as bs
+import lxml.html
+from bs4.element import Comment
+from lxml import etree
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+
+def parse_cses_problems(html):
+    soup = bs.BeautifulSoup(html, 'lxml')
+    task_lists = soup.find_all('ul', attrs={'class' : 'task-list'})
+    task_groups = soup.find_all('h2')
+    problems = []
+    for index in range(1, len(task_groups)):
+        group = str(task_groups[index].contents[0])
+        for task in task_lists[index].find_all('li', attrs={'class' : 'task'}):
+            url = 'https://cses.fi' + task.find('a').attrs['href']
+            problems.append({
+                'id': url.split('/')[-1],
+                'name': str(task.find('a').contents[0]),
+                'url': url,
+                'rate': str(task.find('span', attrs={'class' : 'detail'}).contents[0]),
+                'group': group
+            })
+    return problems
+
+def parse_szkopul_problems(html):
+    soup = bs.BeautifulSoup(html, 'lxml')
+    problems = []
+    for row in soup.find_all('tr'):
+        data = row.find_all('td')
+        if data == []:
+            continue
+        problem_data = {
+            'id': str(data[0].contents[0]),
+            'title': str(data[1].find('a').contents[0]),
+            'url': 'https://szkopul.edu.pl' + data[1].find('a').attrs['href'],
+            'tags': [str(tag.contents[0]) for tag in data[2].find_all('a')],
+            'submitters': str(data[3].contents[0])
+        }
+        if int(problem_data['submitters']) > 0:
+            problem_data['percent_correct'] = str(data[4].contents[0])
+            problem_data['average'] = str(data[5].contents[0])
+        problems.append(problem_data)
+    return problems
+
+def parse_szkopul_page_count(html):
+    soup = bs.BeautifulSoup(html, 'lxml')
+    pages = [1]
+    for link in soup.find_all('a', href=re.compile(r'[?&]page=\d+')):
+        pages.append(int(re.search(r'[?&]page=(\d+)', link['href']).group(1)))
+    return max(pages)
+
+def parse_atcoder_contests(html):
+    soup = bs.BeautifulSoup(html, 'lxml')
+    table = soup.find_all('table')[1 + len(soup.find_all('div', attrs={'id': 'contest-table-action'}))]
+    contests = []
+    for contest in table.find('tbody').find_all('tr'):
+        details = contest.find_all('td')
+        contests.append({
+            'start_time': str(details[0].find('a').find('time').contents[0]),
+            'title': str(details[1].find('a').contents[0]),
+            'url': 'https://atcoder.jp' + details[1].find('a')['href'],
+            'duration': str(details[2].contents[0]),
+            'rated_range': str(details[3].contents[0])
+        })
+    return contests
+
+def parse_dmoj_profile_handle(html):
+    soup = bs.BeautifulSoup(html, 'lxml')
+    return str(soup.find('span', attrs={'id' : 'user-links'}).find('b').contents[0])
+
+def has_class(name):
+    return "contains(concat(' ', normalize-space(@class), ' '), ' %s ')" % name
+
+def first_content(element):
+    # same string as BeautifulSoup's str(tag.contents[0]): the leading text, else the markup of the first child
+    if element.text is not None:
+        return element.text
+    if len(element) == 0:
+        raise IndexError('element has no contents')
+    return lxml.html.tostring(element[0], encoding='unicode', with_tail=False)
+
+dmoj_status_xpath = etree.XPath('//span[%s]' % has_class('status'))
+dmoj_time_xpath = etree.XPath('//div[%s]' % has_class('time'))
+dmoj_memory_xpath = etree.XPath('//div[%s]' % has_class('memory'))
+dmoj_name_xpath = etree.XPath('//div[%s]' % has_class('name'))
+dmoj_case_rows_xpath = etree.XPath('(//table[%s])[1]//tr[@id]' % has_class('submissions-status-table'))
+
+def parse_dmoj_submission(html):
+    root = lxml.html.document_fromstring(html)
+    return {
+        'status': first_content(dmoj_status_xpath(root)[0]),
+        'time': first_content(dmoj_time_xpath(root)[-1]).strip(),
+        'memory': first_content(dmoj_memory_xpath(root)[0]),
+        'problem': first_content(dmoj_name_xpath(root)[0].find('.//a'))
+    }
+
+def parse_dmoj_testcases(html):
+    root = lxml.html.document_fromstring(html)
+    result = {
+        'raw_result': first_content(root.body),
+        'cases': []
+    }
+    for row in dmoj_case_rows_xpath(root):
+        try:
+            id = int(row.get('id'))
+        except ValueError:
+            continue
+        children = row.findall('.//td')
+        result['cases'].append({
+            'id': id,
+            'descriptor': first_content(children[0].find('.//b')),
+            'status': first_content(children[1].find('.//span')),
+            'details': {
+                'time': first_content(children[2].find('.//span')).replace(',', ''),
+                'memory': first_content(children[3]).replace('\xa0', ' ').replace(']', ''),
+                'points': first_content(children[4])
+            }
+        })
+    return result
+
+def parse_dmoj_solved_points(html):
+    soup = bs.BeautifulSoup(html, 'lxml')
+    return [int(point.find('a').contents[0].replace('p', '')) for point in soup.find_all('div', attrs={'class': 'pp'})]
+
+def parse_cf_profile_handle(html):
+    soup = bs.BeautifulSoup(html, 'lxml')
+    link = soup.find('h1').find('a')
+    if link.find('span') is not None:
+        return str(link.contents[0].contents[0]) + str(link.contents[1])
+    return str(link.contents[0])
+
+def parse_cf_submission_source(html):
+    soup = bs.BeautifulSoup(html, 'lxml')
+    if soup.find('title').contents[0] == 'Codeforces':
+        return None
+    return str(soup.find('body').find('pre').contents[0])
+
+def tag_visible(element):
+    if element.parent.name in ['style', 'script', 'head', 'title', 'meta', '[document]']:
+        return False
+    if isinstance(element, Comment):
+        return False
+    return True
+
+def parse_wcipeg_summary(html):
+    soup = bs.BeautifulSoup(html, 'lxml')
+    title = str(soup.find('h1', attrs={'id': 'firstHeading'}).contents[0])
+    texts = soup.find('div', attrs={'id': 'mw-content-text'}).find('p').find_all(text=True)
+    return title, ' '.join(t.strip() for t in filter(tag_visible, texts))
+
+
+class ParseExecutor:
+    workers = 2
+
+    pool = None
+
+    def get_pool(self):
+        if self.pool is None:
+            # forking a process that already runs aiohttp and MySQL threads can deadlock the child on their locks,
+            # so workers start from a fresh interpreter instead
+            if 'forkserver' in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context('forkserver')
+                context.set_forkserver_preload([__name__])
+            else:
+                context = multiprocessing.get_context('spawn')
+            self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+        return self.pool
+
+    def shutdown(self, wait=True):
+        pool, self.pool = self.pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=True)
+
+    async def run(self, parser, *args):
+        try:
+            return await asyncio.get_event_loop().run_in_executor(self.get_pool(), parser, *args)
+        except BrokenProcessPool:
+            self.shutdown(wait=False)
+            return await asyncio.get_event_loop().run_in_executor(self.get_pool(), parser, *args)
+
+parsec = ParseExecutor()
@@ -0,0 +1,31 @@
+import io
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+try:
+    from orjson import loads
+except ImportError:
+    from json import loads
+
+
+def iter_items(body, path=''):
+    if ijson is not None:
+        yield from ijson.items(io.BytesIO(body), (path + '.item') if path else 'item', use_float=True)
+        return
+    document = loads(body)
+    for key in path.split('.') if path else []:
+        document = document[key]
+    yield from document
+
+def value_at(body, path, default=None):
+    if ijson is not None:
+        return next(ijson.items(io.BytesIO(body), path, use_float=True), default)
+    document = loads(body)
+    for key in path.split('.'):
+        if not isinstance(document, dict) or key not in document:
+            return default
+        document = document[key]
+    return document
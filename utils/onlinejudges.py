@@ -31,6 +31,14 @@ class OnlineJudges:
         'tc': 'topcoder',
         'top': 'topcoder'
     }
+    problem_hosts = {
+        'dmoj': 'dmoj.ca',
+        'codeforces': 'codeforces.com',
+        'atcoder': 'kenkoooo.com',
+        'cses': 'cses.fi',
+        'szkopul': 'szkopul.edu.pl',
+        'leetcode': 'leetcode.com'
+    }
     thumbnails = {
         'dmoj': 'https://raw.githubusercontent.com/kevinjycui/Practice-Bot/master/assets/dmoj-thumbnail.png',
         'codeforces': 'https://raw.githubusercontent.com/kevinjycui/Practice-Bot/master/assets/cf-thumbnail.png',
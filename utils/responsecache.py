@@ -0,0 +1,43 @@
+import os
+import json
+import hashlib
+
+
+class ResponseCache:
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def path(self, url, extension):
+        return os.path.join(self.directory, hashlib.sha1(url.encode('utf-8')).hexdigest() + extension)
+
+    def validators(self, url):
+        try:
+            with open(self.path(url, '.meta'), 'r') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if not os.path.isfile(self.path(url, '.body')):
+            return {}
+        headers = {}
+        if meta.get('etag') is not None:
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified') is not None:
+            headers['If-Modified-Since'] = meta['last_modified']
+        return headers
+
+    def store(self, url, body, etag, last_modified, charset):
+        if etag is None and last_modified is None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.path(url, '.body') + '.tmp', 'wb') as f:
+            f.write(body)
+        os.replace(self.path(url, '.body') + '.tmp', self.path(url, '.body'))
+        with open(self.path(url, '.meta'), 'w') as f:
+            json.dump({'url': url, 'etag': etag, 'last_modified': last_modified, 'charset': charset}, f)
+
+    def load(self, url):
+        with open(self.path(url, '.meta'), 'r') as f:
+            charset = json.load(f).get('charset') or 'utf-8'
+        with open(self.path(url, '.body'), 'rb') as f:
+            return f.read(), charset
@@ -0,0 +1,95 @@
+import weakref
+from time import monotonic
+from utils.lrucache import LRUCache
+from utils.webclient import webc
+
+
+class SolvedSet:
+    __slots__ = ('problems', 'last_id', 'checked', 'masked')
+
+    def __init__(self, problems=(), last_id=0):
+        self.problems = set(problems)
+        self.last_id = last_id
+        self.checked = monotonic()
+        self.masked = (lambda: None, 0, 0)
+
+    def __len__(self):
+        return len(self.problems)
+
+    def mask(self, catalog):
+        # problems are only ever added, so the size tells whether the bitset is stale
+        version, size, mask = self.masked
+        if version() is not catalog or size != len(self.problems):
+            mask = catalog.mask(self.problems)
+            self.masked = (weakref.ref(catalog), len(self.problems), mask)
+        return mask
+
+class SolvedStore:
+    # seconds before a cached solved set is checked upstream again
+    freshness = 60
+    cf_page_size = 50
+    # a submission without a verdict is still in queue
+    cf_pending_verdicts = (None, 'TESTING')
+
+    def __init__(self, maxsize=512, ttl=3600):
+        self.dmoj = LRUCache(maxsize, ttl)
+        self.codeforces = LRUCache(maxsize, ttl)
+
+    async def dmoj_solved(self, handle):
+        entry = self.dmoj.get(handle.lower())
+        if entry is None or monotonic() - entry.checked >= self.freshness:
+            response = await webc.webget_json('https://dmoj.ca/api/user/info/%s' % handle)
+            entry = SolvedSet(response['solved_problems'])
+            self.dmoj.put(handle.lower(), entry)
+        return entry
+
+    async def cf_submissions(self, handle, start=None):
+        url = 'https://codeforces.com/api/user.status?handle=' + handle
+        if start is not None:
+            url += '&from=%d&count=%d' % (start, self.cf_page_size)
+        response = await webc.webget_json(url)
+        if response['status'] != 'OK':
+            return None
+        return response['result']
+
+    def add_cf_submissions(self, entry, submissions):
+        for sub in submissions:
+            if sub['id'] > entry.last_id and sub.get('verdict') == 'OK':
+                entry.problems.add((sub['problem'].get('contestId', sub['problem'].get('problemsetName')), sub['problem']['index']))
+
+    def cf_cursor(self, entry, submissions):
+        # the cursor stops below the oldest submission still being judged, so it is read again once it has a verdict
+        newer = [sub for sub in submissions if sub['id'] > entry.last_id]
+        pending = [sub['id'] for sub in newer if sub.get('verdict') in self.cf_pending_verdicts]
+        if len(pending) > 0:
+            return min(pending) - 1
+        return max([entry.last_id] + [sub['id'] for sub in newer])
+
+    async def cf_solved(self, handle):
+        entry = self.codeforces.get(handle.lower())
+        if entry is None:
+            submissions = await self.cf_submissions(handle)
+            if submissions is None:
+                return None
+            entry = SolvedSet()
+            self.add_cf_submissions(entry, submissions)
+            entry.last_id = self.cf_cursor(entry, submissions)
+            self.codeforces.put(handle.lower(), entry)
+        elif monotonic() - entry.checked >= self.freshness:
+            # user.status is newest first, so page back until the last seen submission shows up
+            start, seen = 1, []
+            while True:
+                submissions = await self.cf_submissions(handle, start)
+                if submissions is None:
+                    return None
+                self.add_cf_submissions(entry, submissions)
+                seen += submissions
+                if len(submissions) < self.cf_page_size or any(sub['id'] <= entry.last_id for sub in submissions):
+                    break
+                start += self.cf_page_size
+            entry.last_id = self.cf_cursor(entry, seen)
+            entry.checked = monotonic()
+            self.codeforces.put(handle.lower(), entry)
+        return entry
+
+solved_store = SolvedStore()
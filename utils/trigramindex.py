@@ -0,0 +1,75 @@
+import re
+import heapq
+from array import array
+
+
+def trigrams(text):
+    padded = ' ' + ' '.join(re.sub(r'[^\w]+', ' ', text.lower()).split()) + ' '
+    return {padded[index:index+3] for index in range(len(padded)-2)}
+
+def next_bit(bits, start):
+    rest = bits >> start
+    if rest == 0:
+        return None
+    return start + (rest & -rest).bit_length() - 1
+
+class TrigramIndex:
+    # posting lists holding more than 1/dense_ratio of the titles are kept as bitsets. Converting those on every
+    # query is what costs, and only the few hundred trigrams of common words get that far
+    dense_ratio = 256
+
+    def __init__(self, titles):
+        titles = list(titles)
+        sizes = [min(len(trigrams(title)), 0xFFFF) for title in titles]
+        # titles are ranked by trigram count, so for a given number of hits a lower rank never scores lower
+        self.ids = array('I', sorted(range(len(titles)), key=lambda id: (sizes[id], id)))
+        self.sizes = array('H', (sizes[id] for id in self.ids))
+        self.postings = {}
+        for rank, id in enumerate(self.ids):
+            for gram in trigrams(titles[id]):
+                if gram not in self.postings:
+                    self.postings[gram] = array('I')
+                self.postings[gram].append(rank)
+        for gram, ranks in self.postings.items():
+            if len(ranks) * self.dense_ratio > len(self.ids):
+                self.postings[gram] = self.bitset(ranks)
+
+    def bitset(self, ranks):
+        bits = bytearray((len(self.ids)+7)//8)
+        for rank in ranks:
+            bits[rank >> 3] |= 1 << (rank & 7)
+        return int.from_bytes(bits, 'little')
+
+    def push_match(self, streams, matches, start, count, size):
+        rank = next_bit(matches, start)
+        if rank is not None:
+            heapq.heappush(streams, (-count / (size + self.sizes[rank] - count), rank, count, matches))
+
+    def search(self, query, limit=5):
+        grams = trigrams(query)
+        # bit i of planes[j] is bit j of how many query trigrams the title ranked i holds, summed by a ripple-carry adder
+        planes = []
+        for gram in grams:
+            carry = self.postings.get(gram, 0)
+            if not isinstance(carry, int):
+                carry = self.bitset(carry)
+            for plane in range(len(planes)):
+                if not carry:
+                    break
+                planes[plane], carry = planes[plane] ^ carry, planes[plane] & carry
+            if carry:
+                planes.append(carry)
+        # one stream of titles per hit count, each in rank order so its Jaccard similarity only falls. A heap merges them
+        streams = []
+        everything = (1 << len(self.ids)) - 1
+        for count in range(1, min(len(grams), (1 << len(planes)) - 1) + 1):
+            matches = everything
+            for plane, bits in enumerate(planes):
+                matches &= bits if count >> plane & 1 else ~bits
+            self.push_match(streams, matches, 0, count, len(grams))
+        best = []
+        while streams and len(best) < limit:
+            score, rank, count, matches = heapq.heappop(streams)
+            best.append((-score, self.ids[rank]))
+            self.push_match(streams, matches, rank + 1, count, len(grams))
+        return best
@@ -1,34 +1,167 @@
-# import aiohttp
-# import asyncio
-import requests
+import aiohttp
+import asyncio
+import json
+import random as rand
+from contextlib import asynccontextmanager
+from importlib.util import find_spec
+from urllib.parse import urlsplit
+from utils.circuitbreaker import CircuitBreaker, CircuitOpenException
+from utils.hostlimiter import HostLimiterGroup, Priority
+from utils.responsecache import ResponseCache
+
+# aiohttp decodes br bodies only when brotli is installed
+accept_encoding = 'gzip, deflate, br' if find_spec('brotli') is not None else 'gzip, deflate'
 
 
 class WebSession:
-    # session = aiohttp.ClientSession()
-
-    async def webget_text(self, url, headers={}):
-        return requests.get(url, headers=headers).text
-        # async with self.session.get(url, headers=headers) as resp:
-        #     return await resp.text()
-
-    async def webget_json(self, url, headers={}):
-        return requests.get(url, headers=headers).json()
-        # async with self.session.get(url, headers=headers) as resp:
-        #     return await resp.json(content_type=None)
-
-    async def webpost(self, url, data={}, headers={}):
-        return requests.post(url, data=data, headers=headers, allow_redirects=True)
-        # async with self.session.post(url, data=data, headers=headers) as resp:
-        #     return resp
-
-    async def webpost_text(self, url, data={}, headers={}):
-        return requests.post(url, data=data, headers=headers, allow_redirects=True).text
-        # async with self.session.post(url, data=data, headers=headers) as resp:
-        #     return await resp.text()
-
-    async def webpost_json(self, url, json={}, headers={}):
-        return requests.post(url, json=json, headers=headers, allow_redirects=True).json()
-        # async with self.session.post(url, json=json, headers=headers) as resp:
-        #     return await resp.json(content_type=None)
+    connection_limit = 100
+    connection_limit_per_host = 10
+    dns_cache_ttl = 300
+    keepalive_timeout = 30
+    timeout = aiohttp.ClientTimeout(total=30, connect=10, sock_read=20)
+
+    # host: (requests per second, burst, max in flight)
+    host_limits = {
+        'codeforces.com': (5, 5, 4),
+        'dmoj.ca': (3, 6, 4),
+        'szkopul.edu.pl': (2, 4, 2),
+        'cses.fi': (2, 4, 2)
+    }
+    default_host_limit = (10, 10, 8)
+
+    interactive_retries = 1
+    background_retries = 3
+    backoff_base = 0.5
+    backoff_cap = 8
+
+    session = None
+
+    def __init__(self):
+        self.limiters = HostLimiterGroup(self.host_limits, self.default_host_limit)
+        self.cache = ResponseCache('data/http_cache')
+        self.breakers = {}
+        self.pending = {}
+        # url: (etag, last modified) of the cached body last returned for it
+        self.served = {}
+
+    def get_session(self):
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.connection_limit,
+                limit_per_host=self.connection_limit_per_host,
+                ttl_dns_cache=self.dns_cache_ttl,
+                keepalive_timeout=self.keepalive_timeout,
+                enable_cleanup_closed=True
+            )
+            self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout, headers={'Accept-Encoding': accept_encoding})
+        return self.session
+
+    def breaker(self, host):
+        if host not in self.breakers:
+            self.breakers[host] = CircuitBreaker()
+        return self.breakers[host]
+
+    @asynccontextmanager
+    async def request(self, method, url, background=False, **kwargs):
+        host = urlsplit(url).hostname
+        breaker = self.breaker(host)
+        if not breaker.allow():
+            raise CircuitOpenException(host, breaker.retry_in())
+        limiter = self.limiters.get(host)
+        recorded = False
+        try:
+            await limiter.acquire(Priority.BACKGROUND if background else Priority.INTERACTIVE)
+        except asyncio.CancelledError:
+            breaker.cancel()
+            raise
+        try:
+            async with self.get_session().request(method, url, **kwargs) as resp:
+                breaker.record(resp.status < 500 and resp.status != 429)
+                recorded = True
+                yield resp
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            if not recorded:
+                breaker.record(False)
+                recorded = True
+            raise
+        finally:
+            if not recorded:
+                breaker.cancel()
+            limiter.release()
+
+    async def fetch_once(self, url, headers, background, cache, if_modified):
+        validators = self.cache.validators(url) if cache else {}
+        async with self.request('GET', url, background, headers=dict(headers, **validators)) as resp:
+            if resp.status >= 500 or resp.status == 429:
+                resp.raise_for_status()
+            body = await resp.read()
+            charset = resp.get_encoding()
+        # cached catalogs run to several megabytes, so the disk work stays off the loop
+        if cache and resp.status == 304:
+            served = (validators.get('If-None-Match'), validators.get('If-Modified-Since'))
+            if if_modified and self.served.get(url) == served:
+                return None, None
+            self.served[url] = served
+            return await asyncio.get_event_loop().run_in_executor(None, self.cache.load, url)
+        if cache and resp.status == 200:
+            self.served[url] = (resp.headers.get('ETag'), resp.headers.get('Last-Modified'))
+            await asyncio.get_event_loop().run_in_executor(None, self.cache.store, url, body, resp.headers.get('ETag'), resp.headers.get('Last-Modified'), charset)
+        return body, charset
+
+    async def fetch(self, url, headers, background, cache, if_modified=False):
+        retries = self.background_retries if background else self.interactive_retries
+        for attempt in range(retries + 1):
+            try:
+                return await self.fetch_once(url, headers, background, cache, if_modified)
+            except CircuitOpenException:
+                raise
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                if attempt == retries:
+                    raise
+            await asyncio.sleep(rand.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt)))
+
+    def forget(self, key, task):
+        if self.pending.get(key) is task:
+            del self.pending[key]
+
+    async def coalesce(self, key, factory):
+        # keys include the priority, so an interactive caller never waits on a background fetch with its retries
+        if key not in self.pending:
+            task = asyncio.ensure_future(factory())
+            task.add_done_callback(lambda task: self.forget(key, task))
+            self.pending[key] = task
+        return await asyncio.shield(self.pending[key])
+
+    # with if_modified, a cached GET returns None when upstream answers 304 for the body this session already returned
+    async def webget_text(self, url, headers={}, background=False, cache=False, if_modified=False):
+        async def get():
+            body, charset = await self.fetch(url, headers, background, cache, if_modified)
+            return None if body is None else body.decode(charset, errors='replace')
+        return await self.coalesce(('text', url, frozenset(headers.items()), background, if_modified), get)
+
+    async def webget_raw(self, url, headers={}, background=False, cache=False, if_modified=False):
+        async def get():
+            body, charset = await self.fetch(url, headers, background, cache, if_modified)
+            return body
+        return await self.coalesce(('raw', url, frozenset(headers.items()), background, if_modified), get)
+
+    async def webget_json(self, url, headers={}, background=False, cache=False):
+        async def get():
+            body, charset = await self.fetch(url, headers, background, cache)
+            return json.loads(body.decode(charset, errors='replace'))
+        return await self.coalesce(('json', url, frozenset(headers.items()), background), get)
+
+    async def webpost(self, url, data={}, headers={}, background=False):
+        async with self.request('POST', url, background, data=data, headers=headers, allow_redirects=True) as resp:
+            await resp.read()
+            return resp
+
+    async def webpost_text(self, url, data={}, headers={}, background=False):
+        async with self.request('POST', url, background, data=data, headers=headers, allow_redirects=True) as resp:
+            return await resp.text()
+
+    async def webpost_json(self, url, json={}, headers={}, background=False):
+        async with self.request('POST', url, background, json=json, headers=headers, allow_redirects=True) as resp:
+            return await resp.json(content_type=None)
 
 webc = WebSession()